@@ -0,0 +1,54 @@
+"""Compare voluptuous `Schema`, `SchemaDictNone` and their
+`compile_schema()` versions, on flat payloads of 20, 50 and 200 keys.
+
+Usage:
+    python benchmarks/bench_compile_schema.py
+
+"""
+import timeit
+
+from voluptuous import Required, Schema
+
+from yesaide.validation import Choice, Integeable, Mail, SchemaDictNone, compile_schema
+
+NUMBER = 2000
+
+
+def build(keys_count):
+    schema_dict = {Required("id"): Integeable()}
+    payload = {"id": "1"}
+    validators = (
+        (Integeable(), "12"),
+        (Mail(lower=True), "Some@Where.FR"),
+        (Choice(["a", "b", "c"]), "b"),
+        (str, "text"),
+    )
+    for i in range(keys_count - 1):
+        validator, value = validators[i % len(validators)]
+        schema_dict["key{}".format(i)] = validator
+        payload["key{}".format(i)] = None if i % 8 == 7 else value
+
+    return schema_dict, payload
+
+
+def main():
+    print("{:>5} {:>14} {:>13} {:>12}".format("keys", "schema", "voluptuous µs", "compiled µs"))
+    for keys_count in (20, 50, 200):
+        schema_dict, payload = build(keys_count)
+        not_none_payload = {k: v for k, v in payload.items() if v is not None}
+
+        for name, schema, data in (
+            ("Schema", Schema(schema_dict), not_none_payload),
+            ("SchemaDictNone", SchemaDictNone(schema_dict), payload),
+        ):
+            compiled = compile_schema(schema)
+            assert compiled(data) == schema(data)
+            durations = [
+                min(timeit.repeat(lambda: validate(data), number=NUMBER, repeat=5)) / NUMBER * 1e6
+                for validate in (schema, compiled)
+            ]
+            print("{:>5} {:>14} {:>13.2f} {:>12.2f}".format(keys_count, name, *durations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Compare the ISO shortcuts of `Dateable()` and `Datetimeable()` with
+the `strptime()` path.
+
+Usage:
+    python benchmarks/bench_dateable.py
+
+"""
+import datetime
+import timeit
+
+from yesaide.validation import Dateable, Datetimeable
+
+NUMBER = 100000
+
+
+def strptime_date(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def strptime_datetime(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+
+
+def main():
+    for name, validate, value in (
+        ("strptime date", strptime_date, "2015-11-13"),
+        ("Dateable()", Dateable(), "2015-11-13"),
+        ("Dateable(), not padded", Dateable(), "2015-1-3"),
+        ("strptime datetime", strptime_datetime, "2015-11-13T21:30:00+01:00"),
+        ("Datetimeable()", Datetimeable(), "2015-11-13T21:30:00+01:00"),
+        ("Datetimeable(), Z", Datetimeable(), "2015-11-13T21:30:00Z"),
+    ):
+        duration = min(timeit.repeat(lambda: validate(value), number=NUMBER, repeat=5))
+        print("{:<24} {:>8.2f} µs".format(name, duration / NUMBER * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare eager and lazy (`LazyWorker`) foreman construction, for a
+foreman managing 30 workers of which a request uses 2.
+
+Usage:
+    python benchmarks/bench_foreman.py
+
+"""
+import timeit
+
+from sqlalchemy import Column, Integer
+from sqlalchemy.ext.declarative import declarative_base
+
+from yesaide import database, foreman, worker
+
+
+WORKERS_COUNT = 30
+NUMBER = 20000
+
+Base = declarative_base(cls=database.MetaBase)
+
+mappings = [
+    type(
+        "Mapping{}".format(i),
+        (Base,),
+        {"__tablename__": "mappings_{}".format(i), "id": Column(Integer, primary_key=True)},
+    )
+    for i in range(WORKERS_COUNT)
+]
+
+
+class EagerForeman(foreman.RawForeman):
+    def __init__(self, dbsession=None):
+        foreman.RawForeman.__init__(self, dbsession)
+
+        for i, a_mapping in enumerate(mappings):
+            setattr(
+                self,
+                "worker_{}".format(i),
+                worker.MappingManagingWorker(
+                    self, managed_sqla_map=a_mapping, managed_sqla_map_name="mapping"
+                ),
+            )
+
+
+LazyForeman = type(
+    "LazyForeman",
+    (foreman.RawForeman,),
+    {
+        "worker_{}".format(i): foreman.LazyWorker(
+            worker.MappingManagingWorker,
+            managed_sqla_map=a_mapping,
+            managed_sqla_map_name="mapping",
+        )
+        for i, a_mapping in enumerate(mappings)
+    },
+)
+
+
+def request(foreman_cls):
+    a_foreman = foreman_cls(dbsession=None)
+    a_foreman.worker_3
+    a_foreman.worker_17
+
+
+def main():
+    for foreman_cls in (EagerForeman, LazyForeman):
+        duration = min(timeit.repeat(lambda: request(foreman_cls), number=NUMBER, repeat=5))
+        print(
+            "{:<14} {:8.2f} µs per request".format(
+                foreman_cls.__name__, duration / NUMBER * 1000000
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compare the CHAR(32) and BINARY(16) storage modes of `GUIDType` on
+SQLite: database size (table + primary key index) and lookup speed.
+
+Usage:
+    python benchmarks/bench_guid.py [rows]
+
+"""
+
+import os
+import random
+import sys
+import tempfile
+import timeit
+import uuid
+
+from sqlalchemy import bindparam, create_engine, select, text, Column, MetaData, Table
+
+from yesaide import database
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+LOOKUPS = 5000
+
+
+def bench(binary):
+    metadata = MetaData()
+    table = Table(
+        "guids", metadata, Column("uuid", database.GUIDType(binary=binary), primary_key=True)
+    )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine("sqlite:///{}".format(os.path.join(tmpdir, "bench.db")))
+        metadata.create_all(engine)
+
+        uuids = [uuid.uuid4() for _ in range(ROWS)]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), [{"uuid": u} for u in uuids])
+
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM"))
+            page_size = conn.execute(text("PRAGMA page_size")).scalar()
+            page_count = conn.execute(text("PRAGMA page_count")).scalar()
+
+            lookups = random.sample(uuids, LOOKUPS)
+
+            statement = select(table.c.uuid).where(table.c.uuid == bindparam("uuid"))
+
+            def lookup():
+                for an_uuid in lookups:
+                    conn.execute(statement, {"uuid": an_uuid}).scalar_one()
+
+            duration = min(timeit.repeat(lookup, number=1, repeat=3))
+
+        engine.dispose()
+
+    return page_size * page_count, duration
+
+
+def main():
+    print("{} rows, {} lookups".format(ROWS, LOOKUPS))
+    for binary in (False, True):
+        size, duration = bench(binary)
+        print(
+            "{:<10} {:8.2f} MiB {:8.2f} µs per lookup".format(
+                "BINARY(16)" if binary else "CHAR(32)",
+                size / 1024 / 1024,
+                duration / LOOKUPS * 1000000,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare `SchemaDictNone` with its previous implementation (copy the
+payload, pop its None values, validate, put them back), on payloads of
+20, 50 and 200 keys, without and with None values.
+
+Usage:
+    python benchmarks/bench_schema_dict_none.py
+
+"""
+import timeit
+
+from voluptuous import Required, Schema
+
+from yesaide.validation import Integeable, SchemaDictNone
+
+NUMBER = 2000
+
+
+class LegacySchemaDictNone(Schema):
+    def __init__(self, schema, required=False, extra=False, not_none=False):
+        Schema.__init__(self, schema, required, extra)
+        self._not_none = not_none if not_none is not False else ()
+
+    def __call__(self, data):
+        _data = data.copy()
+        popped = []
+
+        for k, v in data.items():
+            if v is None and k not in self._not_none:
+                _data.pop(k)
+                popped.append((k, v))
+
+        schema_out = Schema.__call__(self, _data)
+        for k, v in popped:
+            schema_out[k] = v
+
+        return schema_out
+
+
+def build(keys_count):
+    schema_dict = {Required("id"): int}
+    not_none = []
+    for i in range(keys_count - 1):
+        key = "key{}".format(i)
+        schema_dict[key] = Integeable() if i % 2 else str
+        if i % 10 == 0:
+            not_none.append(key)
+
+    payload = {"id": 1}
+    payload_with_none = {"id": 1}
+    for i in range(keys_count - 1):
+        key = "key{}".format(i)
+        payload[key] = i if i % 2 else str(i)
+        # A quarter of the nullable values are None.
+        payload_with_none[key] = None if i % 4 == 3 else payload[key]
+
+    return schema_dict, not_none, payload, payload_with_none
+
+
+def main():
+    print("{:>5} {:>10} {:>12} {:>12}".format("keys", "None", "legacy µs", "current µs"))
+    for keys_count in (20, 50, 200):
+        schema_dict, not_none, payload, payload_with_none = build(keys_count)
+        legacy = LegacySchemaDictNone(schema_dict, not_none=not_none)
+        current = SchemaDictNone(schema_dict, not_none=not_none)
+
+        for label, data in (("no", payload), ("25%", payload_with_none)):
+            assert legacy(data) == current(data)
+            durations = [
+                min(timeit.repeat(lambda: schema(data), number=NUMBER, repeat=5)) / NUMBER * 1e6
+                for schema in (legacy, current)
+            ]
+            print("{:>5} {:>10} {:>12.2f} {:>12.2f}".format(keys_count, label, *durations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the insert throughput of `uuid.uuid4()` and
+`database.uuid7()` primary keys on SQLite, once the table is large
+enough for the index not to fit in the page cache.
+
+Usage:
+    python benchmarks/bench_uuid7.py [rows]
+
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, Column, Integer, MetaData, Table
+
+from yesaide import database
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+BATCH = 5000
+
+
+def bench(generate):
+    metadata = MetaData()
+    table = Table(
+        "guids",
+        metadata,
+        Column("uuid", database.GUIDType(binary=True), primary_key=True, default=generate),
+        Column("value", Integer),
+    )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine("sqlite:///{}".format(os.path.join(tmpdir, "bench.db")))
+        metadata.create_all(engine)
+
+        with engine.connect() as conn:
+            # 2 MiB page cache: random inserts stop fitting in it quickly.
+            conn.exec_driver_sql("PRAGMA cache_size = -2000")
+
+            start = time.perf_counter()
+            for offset in range(0, ROWS, BATCH):
+                with conn.begin():
+                    conn.execute(table.insert(), [{"value": i} for i in range(BATCH)])
+            duration = time.perf_counter() - start
+
+        engine.dispose()
+
+    return duration
+
+
+def main():
+    print("{} rows, {} rows per transaction".format(ROWS, BATCH))
+    for name, generate in (("uuid4", uuid.uuid4), ("uuid7", database.uuid7)):
+        duration = bench(generate)
+        print("{:<6} {:10.0f} rows/s".format(name, ROWS / duration))
+
+
+if __name__ == "__main__":
+    main()
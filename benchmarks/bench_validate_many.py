@@ -0,0 +1,67 @@
+"""Compare calling a schema on each row with `validate_many()` on CSV
+like rows (all values are strings), with 1% of invalid rows.
+
+Usage:
+    python benchmarks/bench_validate_many.py
+
+"""
+import timeit
+
+from voluptuous import MultipleInvalid, Required, Schema
+
+from yesaide.validation import Choice, Dateable, Decimable, Floatable, Integeable, validate_many
+
+ROWS_COUNT = 20000
+
+
+def build():
+    schema = Schema(
+        {
+            Required("id"): Integeable(),
+            "quantity": Integeable(empty_to_none=True),
+            "ratio": Floatable(),
+            "price": Decimable(),
+            "day": Dateable(),
+            "kind": Choice(["a", "b", "c"]),
+            "label": str,
+        }
+    )
+    rows = [
+        {
+            "id": str(i),
+            "quantity": "" if i % 10 == 0 else str(i % 7),
+            "ratio": "0.{}".format(i),
+            "price": "{}.99".format(i % 100),
+            "day": "2015-11-{:02d}".format(i % 28 + 1),
+            "kind": "abc"[i % 3] if i % 100 else "z",
+            "label": "label {}".format(i),
+        }
+        for i in range(ROWS_COUNT)
+    ]
+    return schema, rows
+
+
+def schema_loop(schema, rows):
+    valid = []
+    errors = []
+    for i, row in enumerate(rows):
+        try:
+            valid.append(schema(row))
+        except MultipleInvalid as exc:
+            errors.append((i, exc))
+    return errors
+
+
+def main():
+    schema, rows = build()
+    for name, function in (
+        ("schema", schema_loop),
+        ("validate_many", lambda schema, rows: validate_many(schema, rows).errors),
+    ):
+        errors = function(schema, rows)
+        duration = min(timeit.repeat(lambda: function(schema, rows), number=1, repeat=5))
+        print("{:<14} {:>8.1f} ms ({} invalid rows)".format(name, duration * 1e3, len(errors)))
+
+
+if __name__ == "__main__":
+    main()
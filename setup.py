@@ -22,6 +22,7 @@ setup(
         "jwcrypto>=0.6,<0.7",
         "python-dateutil>=2,<3",
     ],
+    entry_points={"console_scripts": ["yesaide = yesaide.cli:main"]},
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
@@ -0,0 +1,132 @@
+import asyncio
+import unittest
+import uuid
+
+from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import joinedload, relationship
+from sqlalchemy.orm.exc import NoResultFound
+
+from yesaide import async_foreman, async_worker, database, foreman
+
+try:
+    import aiosqlite
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    status = Column(String(10), default="active")
+    tags = relationship("Tag")
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+    id = Column(Integer, primary_key=True)
+    mapping_id = Column(Integer, ForeignKey("mappings.id"))
+
+
+class MappingUUID(Base):
+    __tablename__ = "mappings_uuid"
+    uuid = Column(database.GUIDType, primary_key=True, default=uuid.uuid4)
+
+
+class ActiveWorker(async_worker.AsyncMappingManagingWorker):
+    serializer_fields = ("id", "status")
+    load_profiles = {"with_tags": [joinedload(Mapping.tags)]}
+
+    def __init__(self, a_foreman):
+        async_worker.AsyncMappingManagingWorker.__init__(
+            self, a_foreman, managed_sqla_map=Mapping, managed_sqla_map_name="mapping"
+        )
+
+    def base_query(self, **kwargs):
+        return async_worker.AsyncMappingManagingWorker.base_query(self).where(
+            Mapping.status == "active"
+        )
+
+    @database.async_db_method
+    async def create(self, **kwargs):
+        a_mapping = Mapping(**kwargs)
+        self._dbsession.add(a_mapping)
+        return a_mapping
+
+
+class Foreman(async_foreman.AsyncRawForeman):
+    mappings = foreman.LazyWorker(ActiveWorker)
+    uuids = foreman.LazyWorker(
+        async_worker.AsyncMappingManagingWorker, managed_sqla_map=MappingUUID
+    )
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite is not installed")
+class TestAsyncWorker(unittest.TestCase):
+    def run_async(self, coroutine_function):
+        async def run():
+            engine = create_async_engine("sqlite+aiosqlite://")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+            async with AsyncSession(engine, expire_on_commit=False) as dbsession:
+                await coroutine_function(Foreman(dbsession), dbsession)
+
+            await engine.dispose()
+
+        asyncio.run(run())
+
+    def test_db_method_and_get(self):
+        async def test(a_foreman, dbsession):
+            await a_foreman.mappings.create(id=1)
+            await a_foreman.mappings.create(id=2, status="inactive", commit=False)
+            self.assertTrue(dbsession.new)
+            await dbsession.commit()
+
+            a_mapping = await a_foreman.mappings.get(1)
+            self.assertEqual(a_mapping.id, 1)
+            self.assertEqual(a_foreman.mappings.serialize(a_mapping), {"id": 1, "status": "active"})
+
+            self.assertIs(await a_foreman.mappings.get(mapping_id=1), a_mapping)
+
+            with self.assertRaises(NoResultFound):
+                await a_foreman.mappings.get(2)
+
+        self.run_async(test)
+
+    def test_get_many(self):
+        async def test(a_foreman, dbsession):
+            for i in range(1, 6):
+                await a_foreman.mappings.create(id=i, commit=False)
+            await dbsession.commit()
+
+            a_foreman.mappings.get_many_chunk_size = 2
+            objs = await a_foreman.mappings.get_many([5, 1, 3, 42], missing="none")
+            self.assertEqual([o and o.id for o in objs], [5, 1, 3, None])
+
+            an_uuid = uuid.uuid4()
+            dbsession.add(MappingUUID(uuid=an_uuid))
+            await dbsession.commit()
+            objs = await a_foreman.uuids.get_many([str(an_uuid)])
+            self.assertEqual(objs[0].uuid, an_uuid)
+
+        self.run_async(test)
+
+    def test_joined_profile(self):
+        async def test(a_foreman, dbsession):
+            await a_foreman.mappings.create(id=1, commit=False)
+            dbsession.add_all([Tag(id=1, mapping_id=1), Tag(id=2, mapping_id=1)])
+            await dbsession.commit()
+            dbsession.expunge_all()
+
+            a_mapping = await a_foreman.mappings.get(1, profile="with_tags")
+            self.assertEqual(sorted(tag.id for tag in a_mapping.tags), [1, 2])
+
+            objs = await a_foreman.mappings.get_many([1], profile="with_tags")
+            self.assertEqual(len(objs[0].tags), 2)
+
+        self.run_async(test)
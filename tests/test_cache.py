@@ -0,0 +1,193 @@
+import unittest
+
+from sqlalchemy import create_engine, event, Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import load_only, sessionmaker
+
+from yesaide import cache, database, foreman, worker
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Country(Base):
+    __tablename__ = "countries"
+    id = Column(Integer, primary_key=True)
+    code = Column(String(2))
+
+
+class CountryWorker(worker.MappingManagingWorker):
+    cache_backend = None
+
+    def __init__(self, a_foreman):
+        worker.MappingManagingWorker.__init__(
+            self, a_foreman, managed_sqla_map=Country, managed_sqla_map_name="country"
+        )
+
+    @database.db_method
+    def rename(self, country, code):
+        country.code = code
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_lru(self):
+        lru = cache.LRUCache(maxsize=2)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        self.assertEqual(lru.get("a"), 1)
+
+        lru.set("c", 3)
+        self.assertEqual(lru.get("b"), None)
+        self.assertEqual(lru.get("a"), 1)
+        self.assertEqual(lru.get("c"), 3)
+        self.assertEqual(len(lru), 2)
+
+        lru.delete("a")
+        self.assertEqual(lru.get("a", "default"), "default")
+        lru.clear()
+        self.assertEqual(len(lru), 0)
+
+    def test_ttl(self):
+        clock = FakeClock()
+        lru = cache.LRUCache(ttl=10, clock=clock)
+        lru.set("a", 1)
+
+        clock.now = 9
+        self.assertEqual(lru.get("a"), 1)
+        clock.now = 10
+        self.assertEqual(lru.get("a"), None)
+
+
+class TestDictCache(unittest.TestCase):
+    def test_dict_cache(self):
+        store = {}
+        dict_cache = cache.DictCache(store)
+        value = {"id": 1}
+        dict_cache.set(("a", 1), value)
+
+        self.assertEqual(dict_cache.get(("a", 1)), value)
+        self.assertIsNot(dict_cache.get(("a", 1)), value)
+        self.assertEqual(len(store), 1)
+
+        dict_cache.delete(("a", 1))
+        self.assertEqual(dict_cache.get(("a", 1)), None)
+
+
+class BaseTestWorkerCache(object):
+    def make_backend(self):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+        dbsession = self.Session()
+        dbsession.add_all([Country(id=1, code="FR"), Country(id=2, code="DE")])
+        dbsession.commit()
+        dbsession.close()
+
+        CountryWorker.cache_backend = self.make_backend()
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        CountryWorker.cache_backend = None
+
+    def _count(self, conn, cursor, statement, *args):
+        if statement.startswith("SELECT"):
+            self.statements.append(statement)
+
+    def new_worker(self):
+        return CountryWorker(foreman.RawForeman(dbsession=self.Session()))
+
+    def test_read_through(self):
+        a_worker = self.new_worker()
+        self.assertEqual(a_worker.get(1).code, "FR")
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual((a_worker.cache_hits, a_worker.cache_misses), (0, 1))
+
+        another_worker = self.new_worker()
+        country = another_worker.get(1)
+        self.assertEqual(country.code, "FR")
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual((another_worker.cache_hits, another_worker.cache_misses), (1, 0))
+
+        # The object is attached to the new session.
+        self.assertTrue(country in another_worker._dbsession)
+        self.assertIs(another_worker.get(1), country)
+
+    def test_commit_invalidates(self):
+        a_worker = self.new_worker()
+        a_worker.rename(a_worker.get(1), "BE")
+        self.assertEqual(len(self.statements), 1)
+
+        another_worker = self.new_worker()
+        self.assertEqual(another_worker.get(1).code, "BE")
+        self.assertEqual(len(self.statements), 2)
+
+    def test_uncommitted_db_method_does_not_invalidate(self):
+        a_worker = self.new_worker()
+        a_worker.get(2)
+        a_worker.rename(a_worker.get(2), "AT", commit=False)
+        a_worker._dbsession.rollback()
+
+        another_worker = self.new_worker()
+        self.assertEqual(another_worker.get(2).code, "DE")
+        self.assertEqual(another_worker.cache_hits, 1)
+
+    def test_rolled_back_transaction(self):
+        a_worker = self.new_worker()
+        a_worker.get(2)
+        generation = a_worker._cache_key(2)[1]
+
+        with self.assertRaises(ZeroDivisionError):
+            with a_worker.transaction():
+                a_worker.get(1).code = "XX"
+                a_worker._dbsession.flush()
+                self.assertEqual(a_worker.get(1).code, "XX")
+                1 / 0
+
+        self.assertNotEqual(a_worker._cache_key(2)[1], generation)
+
+        another_worker = self.new_worker()
+        self.assertEqual(another_worker.get(1).code, "FR")
+        self.assertEqual(another_worker.cache_hits, 0)
+
+    def test_pending_changes_bypass_cache(self):
+        a_worker = self.new_worker()
+        a_worker.get(1).code = "XX"
+        a_worker.get(2)
+        self.assertEqual((a_worker.cache_hits, a_worker.cache_misses), (0, 1))
+
+        another_worker = self.new_worker()
+        self.assertEqual(another_worker.get(2).code, "DE")
+        self.assertEqual(another_worker.cache_misses, 1)
+
+    def test_options_bypass_cache(self):
+        a_worker = self.new_worker()
+        a_worker.get(1, options=[load_only(Country.code)])
+        another_worker = self.new_worker()
+        another_worker.get(1, options=[load_only(Country.code)])
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual((another_worker.cache_hits, another_worker.cache_misses), (0, 0))
+
+
+class TestWorkerLRUCache(BaseTestWorkerCache, unittest.TestCase):
+    def make_backend(self):
+        return cache.LRUCache(maxsize=10)
+
+
+class TestWorkerDictCache(BaseTestWorkerCache, unittest.TestCase):
+    def make_backend(self):
+        return cache.DictCache()
@@ -1,6 +1,18 @@
+import io
+import json
+import os
+import tempfile
 import unittest
 
-from yesaide import cli
+from voluptuous import Required
+
+from yesaide import cli, validation
+
+# Referenced as "test_cli:SCHEMA" by the tests of `yesaide validate`.
+SCHEMA = validation.SchemaDictNone(
+    {Required("id"): validation.Integeable(), "kind": validation.Choice(["a", "b"])}
+)
+MAIL_SCHEMA = {"mail": validation.Mail()}
 
 
 class TestCLI(unittest.TestCase):
@@ -47,3 +59,92 @@ class TestCLI(unittest.TestCase):
 
         with self.assertRaises(ValueError):
             cli.flags_to_release(is_minor=True, is_major=True)
+
+
+class TestValidate(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, filename, content):
+        path = os.path.join(self.tmpdir.name, filename)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def run_main(self, *argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        code = cli.main(list(argv), stdout, stderr)
+        reports = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        return code, reports, stderr.getvalue()
+
+    def test_load_schema(self):
+        self.assertIs(cli.load_schema("test_cli:SCHEMA"), SCHEMA)
+        self.assertIs(
+            cli.load_schema("yesaide.validation:SchemaDictNone"), validation.SchemaDictNone
+        )
+
+        with self.assertRaises(ValueError):
+            cli.load_schema("test_cli")
+
+    def test_ndjson(self):
+        lines = ['{"id": %d, "kind": "a"}' % i for i in range(50)]
+        lines[3] = '{"id": "x", "kind": "c"}'
+        lines[10] = "{bla"
+        lines[20] = ""
+        lines[30] = "[1]"
+        lines[40] = '{"kind": null}'
+        path = self.write("records.ndjson", "\n".join(lines) + "\n")
+
+        for jobs in ("1", "3"):
+            code, reports, summary = self.run_main(
+                "validate", "test_cli:SCHEMA", path, "-j", jobs, "--chunk-size", "4"
+            )
+
+            self.assertEqual(code, 1)
+            self.assertEqual(summary, "49 records, 4 invalid.\n")
+            self.assertEqual([report["record"] for report in reports], [4, 11, 30, 40])
+            self.assertEqual(
+                sorted(error["path"] for error in reports[0]["errors"]), [["id"], ["kind"]]
+            )
+            self.assertTrue(reports[1]["errors"][0]["message"].startswith("Invalid JSON"))
+            self.assertEqual(
+                reports[3]["errors"], [{"path": ["id"], "message": "required key not provided"}]
+            )
+
+    def test_csv(self):
+        path = self.write("records.csv", "id,kind\n1,a\n2,\nx,b\n")
+
+        code, reports, summary = self.run_main("validate", "test_cli:SCHEMA", path, "-j", "2")
+
+        self.assertEqual(code, 1)
+        self.assertEqual(summary, "3 records, 2 invalid.\n")
+        self.assertEqual([report["record"] for report in reports], [2, 3])
+
+    def test_unexpected_exception(self):
+        # `Mail()` raises a `TypeError` on integers.
+        path = self.write("records.ndjson", '{"mail": "a@b.fr"}\n{"mail": 12}\n')
+
+        for jobs in ("1", "2"):
+            code, reports, summary = self.run_main(
+                "validate", "test_cli:MAIL_SCHEMA", path, "-j", jobs
+            )
+
+            self.assertEqual(code, 1)
+            self.assertEqual(summary, "2 records, 1 invalid.\n")
+            self.assertEqual([report["record"] for report in reports], [2])
+            self.assertTrue(reports[0]["errors"][0]["message"].startswith("TypeError: "))
+
+    def test_valid(self):
+        path = self.write("records.txt", '{"id": 1}\n')
+
+        self.assertEqual(
+            self.run_main("validate", "test_cli:SCHEMA", path), (0, [], "1 records, 0 invalid.\n")
+        )
+
+    def test_wrong_schema(self):
+        path = self.write("records.ndjson", "")
+
+        code, reports, summary = self.run_main("validate", "test_cli:NOPE", path)
+        self.assertEqual(code, 2)
+        self.assertTrue(summary.startswith("Can't load the schema"))
@@ -1,6 +1,16 @@
+import subprocess
+import sys
+import threading
+import time
 import unittest
+import uuid
 
-from yesaide import database, worker
+from sqlalchemy import create_engine, event, select, text, Column, Integer, MetaData, Table
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from yesaide import database, foreman, worker
 
 
 class TestDatabase(unittest.TestCase):
@@ -54,3 +64,409 @@ class TestDatabase(unittest.TestCase):
     def test_db_method_with_flush_false(self):
         self.worker.fake_method(flush=False)
         self.assertFalse(self.dbsession.has_been_flushed)
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+
+
+class MappingWorker(worker.MappingManagingWorker):
+    def __init__(self, a_foreman):
+        worker.MappingManagingWorker.__init__(self, a_foreman, managed_sqla_map=Mapping)
+        self.invalidations = 0
+
+    @database.db_method
+    def create(self, id):
+        self._dbsession.add(Mapping(id=id))
+
+    def invalidate_cache(self):
+        self.invalidations += 1
+
+
+class TestTransaction(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(engine)
+        self.dbsession = sessionmaker(bind=engine)()
+        self.foreman = foreman.RawForeman(self.dbsession)
+        self.worker = MappingWorker(self.foreman)
+
+        self.commits = 0
+        event.listen(engine, "commit", self._count)
+
+    def tearDown(self):
+        self.dbsession.close()
+
+    def _count(self, conn):
+        self.commits += 1
+
+    def ids(self):
+        return sorted(m.id for m in self.dbsession.query(Mapping))
+
+    def test_single_commit(self):
+        with self.worker.transaction() as tx:
+            self.worker.create(1)
+            self.worker.create(2)
+            self.worker.create(3, commit=False)
+            self.assertEqual(self.commits, 0)
+            self.assertEqual(self.worker.invalidations, 0)
+
+        self.assertEqual(self.commits, 1)
+        self.assertEqual(tx.saved_commits, 2)
+        self.assertEqual(self.worker.invalidations, 1)
+        self.assertFalse(self.dbsession._ya_in_transaction)
+        self.assertEqual(self.ids(), [1, 2, 3])
+
+    def test_rollback(self):
+        with self.assertRaises(ValueError):
+            with self.foreman.transaction():
+                self.worker.create(1)
+                raise ValueError()
+
+        self.assertEqual(self.commits, 0)
+        # What the cache held during the transaction is dropped.
+        self.assertEqual(self.worker.invalidations, 1)
+        self.assertFalse(self.dbsession._ya_in_transaction)
+        self.assertEqual(self.ids(), [])
+
+    def test_nested(self):
+        with self.worker.transaction() as tx:
+            self.worker.create(1)
+
+            with self.worker.transaction() as nested_tx:
+                self.assertIs(nested_tx, tx)
+                self.assertEqual(tx.depth, 2)
+                self.worker.create(2)
+
+            with self.assertRaises(ValueError):
+                with self.worker.transaction():
+                    self.worker.create(3)
+                    raise ValueError()
+
+            self.assertEqual(tx.depth, 1)
+            self.worker.create(4)
+
+        self.assertEqual(self.commits, 1)
+        self.assertEqual(tx.saved_commits, 4)
+        self.assertEqual(self.ids(), [1, 2, 4])
+
+
+class TestTimingHook(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(engine)
+        self.dbsession = sessionmaker(bind=engine)()
+        self.worker = MappingWorker(foreman.RawForeman(self.dbsession))
+        self.calls = []
+
+    def tearDown(self):
+        database.set_timing_hook(None)
+        self.dbsession.close()
+
+    def hook(self, *args):
+        self.calls.append(args)
+
+    def test_global_hook(self):
+        self.worker.create(1)
+        self.assertEqual(self.calls, [])
+
+        self.assertIsNone(database.set_timing_hook(self.hook))
+        self.worker.create(2)
+        self.worker.create(3, commit=False)
+
+        with self.worker.transaction():
+            self.worker.create(4)
+
+        self.assertEqual(
+            [
+                (name, body >= 0, flush is None, commit is None)
+                for name, body, flush, commit in self.calls
+            ],
+            [
+                ("MappingWorker.create", True, False, False),
+                ("MappingWorker.create", True, True, True),
+                ("MappingWorker.create", True, True, True),
+            ],
+        )
+        self.assertEqual(database.set_timing_hook(None), self.hook)
+
+    def test_method_hook(self):
+        calls = self.calls
+
+        class TimedWorker(MappingWorker):
+            @database.db_method(timing_hook=lambda *args: calls.append(args))
+            def create(self, id):
+                self._dbsession.add(Mapping(id=id))
+
+        TimedWorker(foreman.RawForeman(self.dbsession)).create(1, flush=True, commit=False)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][0], "TestTimingHook.test_method_hook.<locals>.TimedWorker.create")
+        self.assertIsNone(calls[0][3])
+
+
+class FakeDBAPIError(Exception):
+    def __init__(self, pgcode):
+        Exception.__init__(self, pgcode)
+        self.pgcode = pgcode
+
+
+class TestRetry(unittest.TestCase):
+    class FakeDbSession(object):
+        def __init__(self):
+            self.commits = 0
+            self.rollbacks = 0
+
+        def commit(self):
+            self.commits += 1
+
+        def rollback(self):
+            self.rollbacks += 1
+
+    def setUp(self):
+        self.sleeps = []
+        self.policy = database.RetryPolicy(max_attempts=3, sleep=self.sleeps.append)
+        self.failures = []
+        policy = self.policy
+        failures = self.failures
+
+        class TestedWorker(worker.RawWorker):
+            @database.db_method(retry=policy)
+            def fake_method(self):
+                if failures:
+                    raise OperationalError("SELECT 1", {}, FakeDBAPIError(failures.pop(0)))
+                return "done"
+
+            @database.db_method(retry=policy)
+            def outer_method(self):
+                return self.fake_method()
+
+        self.dbsession = self.FakeDbSession()
+        self.worker = TestedWorker(self.dbsession)
+
+    def test_retry(self):
+        self.failures.extend(["40001", "40P01"])
+        self.assertEqual(self.worker.fake_method(), "done")
+
+        self.assertEqual(self.dbsession.rollbacks, 2)
+        self.assertEqual(self.dbsession.commits, 1)
+        self.assertEqual(self.policy.retries, 2)
+        self.assertEqual(
+            self.policy.retries_per_method, {"TestRetry.setUp.<locals>.TestedWorker.fake_method": 2}
+        )
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[1] <= 0.1)
+
+    def test_max_attempts(self):
+        self.failures.extend(["40001", "40001", "40001"])
+        with self.assertRaises(OperationalError):
+            self.worker.fake_method()
+        self.assertEqual(self.dbsession.rollbacks, 2)
+        self.assertEqual(self.dbsession.commits, 0)
+
+    def test_not_retryable(self):
+        self.failures.append("23505")
+        with self.assertRaises(OperationalError):
+            self.worker.fake_method()
+        self.assertEqual(self.policy.retries, 0)
+
+    def test_no_retry_without_commit(self):
+        self.failures.append("40001")
+        with self.assertRaises(OperationalError):
+            self.worker.fake_method(commit=False)
+
+        self.failures.append("40001")
+        self.dbsession._ya_in_transaction = True
+        with self.assertRaises(OperationalError):
+            self.worker.fake_method()
+
+        self.assertEqual(self.dbsession.rollbacks, 0)
+
+    def test_no_retry_when_nested(self):
+        self.failures.append("40001")
+        self.assertEqual(self.worker.outer_method(), "done")
+
+        # Only the outermost call, which owns the transaction, retries.
+        self.assertEqual(self.dbsession.rollbacks, 1)
+        self.assertEqual(
+            self.policy.retries_per_method,
+            {"TestRetry.setUp.<locals>.TestedWorker.outer_method": 1},
+        )
+
+    def test_delay(self):
+        policy = database.RetryPolicy(base_delay=1, max_delay=5, jitter=False)
+        self.assertEqual([policy.delay(i) for i in range(1, 5)], [1, 2, 4, 5])
+
+
+class TestGUIDType(unittest.TestCase):
+    def make_table(self, metadata, binary):
+        return Table(
+            "guids",
+            metadata,
+            Column("uuid", database.GUIDType(binary=binary), primary_key=True),
+            Column("other_uuid", database.GUIDType(binary=binary)),
+        )
+
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+
+    def test_binary(self):
+        table = self.make_table(MetaData(), binary=True)
+        table.create(self.engine)
+        an_uuid = uuid.uuid4()
+
+        with self.engine.begin() as conn:
+            conn.execute(table.insert(), [{"uuid": an_uuid}, {"uuid": str(uuid.uuid4())}])
+            self.assertEqual(conn.execute(text("SELECT typeof(uuid) FROM guids")).scalar(), "blob")
+
+            row = conn.execute(table.select().where(table.c.uuid == an_uuid)).one()
+            self.assertEqual(row.uuid, an_uuid)
+            self.assertEqual(row.other_uuid, None)
+
+    def test_migrate_to_binary(self):
+        table = self.make_table(MetaData(), binary=False)
+        table.create(self.engine)
+        uuids = [uuid.uuid4() for _ in range(5)]
+
+        with self.engine.begin() as conn:
+            conn.execute(table.insert(), [{"uuid": u, "other_uuid": u} for u in uuids])
+            database.migrate_guid_column_to_binary(conn, "guids", "uuid", batch_size=2)
+
+        binary_table = self.make_table(MetaData(), binary=True)
+        with self.engine.begin() as conn:
+            statement = select(binary_table.c.uuid).where(binary_table.c.uuid == uuids[3])
+            self.assertEqual(conn.execute(statement).scalar(), uuids[3])
+            self.assertEqual(
+                conn.execute(
+                    text("SELECT count(*) FROM guids WHERE typeof(uuid) = 'blob'")
+                ).scalar(),
+                5,
+            )
+            # Other columns are untouched.
+            self.assertEqual(
+                conn.execute(text("SELECT other_uuid FROM guids LIMIT 1")).scalar(),
+                uuids[0].hex,
+            )
+
+    def test_raw(self):
+        table = Table(
+            "guids",
+            MetaData(),
+            Column("uuid", database.GUIDType(), primary_key=True),
+            Column("raw_uuid", database.GUIDType(raw=True)),
+            Column("binary_raw_uuid", database.GUIDType(binary=True, raw=True)),
+        )
+        table.create(self.engine)
+        an_uuid = uuid.uuid4()
+
+        with self.engine.begin() as conn:
+            conn.execute(
+                table.insert(),
+                {"uuid": an_uuid, "raw_uuid": str(an_uuid), "binary_raw_uuid": an_uuid.hex},
+            )
+            row = conn.execute(table.select()).one()
+
+        self.assertEqual(row.uuid, an_uuid)
+        self.assertEqual(row.raw_uuid, an_uuid.hex)
+        self.assertEqual(row.binary_raw_uuid, an_uuid.hex)
+
+    def test_processors(self):
+        an_uuid = uuid.uuid4()
+        dialect = self.engine.dialect
+
+        for guid_type, bound in (
+            (database.GUIDType(), an_uuid.hex),
+            (database.GUIDType(binary=True), an_uuid.bytes),
+        ):
+            bind = guid_type.dialect_impl(dialect).bind_processor(dialect)
+            self.assertEqual(bind(an_uuid), bound)
+            self.assertEqual(bind(str(an_uuid)), bound)
+            self.assertEqual(bind(None), None)
+
+            result = guid_type.dialect_impl(dialect).result_processor(dialect, None)
+            self.assertEqual(result(bound), an_uuid)
+            self.assertEqual(result(None), None)
+
+            # Still usable through the `TypeDecorator` API.
+            self.assertEqual(guid_type.process_bind_param(an_uuid, dialect), bound)
+            self.assertEqual(guid_type.process_result_value(bound, dialect), an_uuid)
+
+        raw_type = database.GUIDType(raw=True)
+        self.assertEqual(raw_type.process_result_value(an_uuid.hex, dialect), an_uuid.hex)
+
+    def test_postgresql_processors(self):
+        an_uuid = uuid.uuid4()
+        guid_type = database.GUIDType()
+
+        self.assertEqual(guid_type.bind_processor_for("postgresql")(an_uuid), str(an_uuid))
+        self.assertEqual(guid_type.result_processor_for("postgresql")(str(an_uuid)), an_uuid)
+        self.assertEqual(guid_type.result_processor_for("postgresql")(an_uuid), an_uuid)
+
+        result = database.GUIDType(raw=True).result_processor_for("postgresql")
+        self.assertEqual(result(str(an_uuid)), an_uuid.hex)
+        self.assertEqual(result(an_uuid), an_uuid.hex)
+        self.assertEqual(result(None), None)
+
+
+class MappingUUID7(Base):
+    __tablename__ = "mappings_uuid7"
+    uuid = Column(database.GUIDType, primary_key=True, default=database.uuid7)
+
+
+class TestUUID7(unittest.TestCase):
+    def test_layout(self):
+        before_ms = time.time_ns() // 1000000
+        an_uuid = database.uuid7()
+
+        self.assertEqual(an_uuid.version, 7)
+        self.assertEqual(an_uuid.variant, uuid.RFC_4122)
+        self.assertTrue(before_ms <= an_uuid.int >> 80 <= before_ms + 1000)
+
+    def test_monotonic(self):
+        uuids = [database.uuid7() for _ in range(10000)]
+        self.assertEqual(uuids, sorted(uuids))
+        self.assertEqual(len(set(uuids)), len(uuids))
+
+    def test_threads(self):
+        results = []
+
+        def generate():
+            results.append([database.uuid7() for _ in range(2000)])
+
+        threads = [threading.Thread(target=generate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for uuids in results:
+            self.assertEqual(uuids, sorted(uuids))
+        self.assertEqual(len(set(u for uuids in results for u in uuids)), 8000)
+
+    def test_without_fork(self):
+        # E.g. Windows, where `os.register_at_fork()` doesn't exist (the
+        # standard modules using it are imported beforehand).
+        code = (
+            "import os, random, threading; del os.register_at_fork; "
+            "from yesaide import database; database.uuid7()"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_column_default(self):
+        engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(engine)
+        dbsession = sessionmaker(bind=engine)()
+
+        mappings = [MappingUUID7() for _ in range(3)]
+        for a_mapping in mappings:
+            dbsession.add(a_mapping)
+            dbsession.flush()
+        dbsession.commit()
+
+        uuids = [a_mapping.uuid for a_mapping in mappings]
+        self.assertEqual(uuids, sorted(uuids))
+        self.assertEqual([u.version for u in uuids], [7, 7, 7])
+        dbsession.close()
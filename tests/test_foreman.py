@@ -0,0 +1,61 @@
+import unittest
+
+from yesaide import foreman, worker
+
+
+class FakeDbSession(object):
+    pass
+
+
+class FakeMapping(object):
+    id = None
+
+
+class CountingWorker(worker.SupervisedWorker):
+    built = 0
+
+    def __init__(self, a_foreman, name=None):
+        worker.SupervisedWorker.__init__(self, a_foreman)
+        CountingWorker.built += 1
+        self.name = name
+
+
+class Foreman(foreman.RawForeman):
+    counting = foreman.LazyWorker(CountingWorker, name="bla")
+    other_counting = foreman.LazyWorker(CountingWorker)
+    mapping = foreman.LazyWorker(
+        worker.MappingManagingWorker, managed_sqla_map=FakeMapping, managed_sqla_map_name="fake"
+    )
+
+
+class TestLazyWorker(unittest.TestCase):
+    def setUp(self):
+        CountingWorker.built = 0
+        self.dbsession = FakeDbSession()
+        self.foreman = Foreman(self.dbsession)
+
+    def test_lazy(self):
+        self.assertEqual(CountingWorker.built, 0)
+
+        a_worker = self.foreman.counting
+        self.assertEqual(CountingWorker.built, 1)
+        self.assertIs(a_worker._foreman, self.foreman)
+        self.assertIs(a_worker._dbsession, self.dbsession)
+        self.assertEqual(a_worker.name, "bla")
+
+        self.assertIs(self.foreman.counting, a_worker)
+        self.assertEqual(CountingWorker.built, 1)
+
+        self.assertIsNot(self.foreman.other_counting, a_worker)
+        self.assertEqual(CountingWorker.built, 2)
+
+    def test_per_instance(self):
+        another_foreman = Foreman(self.dbsession)
+        self.assertIsNot(self.foreman.counting, another_foreman.counting)
+
+    def test_mapping_worker(self):
+        self.assertIs(self.foreman.mapping._sqla_map, FakeMapping)
+        self.assertTrue(self.foreman.mapping._with_id)
+
+    def test_class_access(self):
+        self.assertTrue(isinstance(Foreman.counting, foreman.LazyWorker))
@@ -0,0 +1,218 @@
+import asyncio
+import unittest
+
+from sqlalchemy import create_engine, Column, ForeignKey, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship, sessionmaker
+
+from yesaide import async_foreman, async_worker, database, foreman, instrumentation, worker
+
+try:
+    import aiosqlite
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Country(Base):
+    __tablename__ = "countries"
+    id = Column(Integer, primary_key=True)
+    code = Column(String(2))
+
+
+class City(Base):
+    __tablename__ = "cities"
+    id = Column(Integer, primary_key=True)
+    country_id = Column(Integer, ForeignKey("countries.id"))
+    country = relationship(Country)
+
+
+class CountryWorker(worker.MappingManagingWorker):
+    def __init__(self, a_foreman):
+        worker.MappingManagingWorker.__init__(
+            self, a_foreman, managed_sqla_map=Country, managed_sqla_map_name="country"
+        )
+
+    def serialize(self, item):
+        return {"code": item.code}
+
+    @database.db_method
+    def create(self, **kwargs):
+        self._dbsession.add(Country(**kwargs))
+
+
+class CityWorker(worker.MappingManagingWorker):
+    def __init__(self, a_foreman):
+        worker.MappingManagingWorker.__init__(
+            self, a_foreman, managed_sqla_map=City, managed_sqla_map_name="city"
+        )
+
+    def serialize(self, item):
+        # Lazy load: one statement per city.
+        return {"id": item.id, "country": self._foreman.countries.serialize(item.country)}
+
+
+class Foreman(foreman.RawForeman):
+    cities = foreman.LazyWorker(CityWorker)
+
+    def __init__(self, dbsession):
+        foreman.RawForeman.__init__(self, dbsession)
+        self.countries = CountryWorker(self)
+
+
+class AsyncForeman(async_foreman.AsyncRawForeman):
+    countries = foreman.LazyWorker(
+        async_worker.AsyncMappingManagingWorker, managed_sqla_map=Country
+    )
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+        self.dbsession = sessionmaker(bind=self.engine)()
+
+        countries = [Country(id=i, code="C{}".format(i)) for i in range(1, 4)]
+        self.dbsession.add_all([City(id=i, country=countries[i - 1]) for i in range(1, 4)])
+        self.dbsession.commit()
+        self.dbsession.expunge_all()
+
+        instrumentation.instrument_engine(self.engine)
+        instrumentation.instrument_engine(self.engine)
+
+    def tearDown(self):
+        instrumentation.uninstrument_engine(self.engine)
+        self.dbsession.close()
+
+    def test_report(self):
+        flagged = []
+        an_instrumentation = instrumentation.QueryInstrumentation(
+            threshold=1, on_threshold=lambda *args: flagged.append(args)
+        )
+        a_foreman = Foreman(self.dbsession)
+        an_instrumentation.attach(a_foreman)
+
+        cities = a_foreman.cities.get_many([1, 2, 3])
+        serialized = [a_foreman.cities.serialize(city) for city in cities]
+        self.assertEqual(serialized[2], {"id": 3, "country": {"code": "C3"}})
+
+        # Statements issued outside instrumented methods are ignored.
+        self.dbsession.query(Country).all()
+
+        report = an_instrumentation.report()
+        self.assertEqual(report["statements"], 4)
+        self.assertEqual(report["methods"]["CityWorker.get_many"]["statements"], 1)
+        self.assertEqual(report["methods"]["CityWorker.serialize"]["calls"], 3)
+        self.assertEqual(report["methods"]["CityWorker.serialize"]["statements"], 3)
+        self.assertEqual(report["methods"]["CountryWorker.serialize"]["statements"], 0)
+        self.assertTrue(report["db_time"] > 0)
+        self.assertEqual(report["flagged"], [])
+
+        list(a_foreman.cities.serialize_iter())
+        self.assertEqual(an_instrumentation.report()["flagged"], [])
+
+        an_instrumentation.reset()
+        an_instrumentation.threshold = 0
+        a_foreman.cities.serialize(a_foreman.cities.get(1))
+        self.assertEqual(
+            an_instrumentation.report()["flagged"],
+            [{"method": "CityWorker.get", "statements": 1}],
+        )
+        self.assertEqual(flagged, [("CityWorker.get", 1)])
+
+    def test_attach_twice(self):
+        an_instrumentation = instrumentation.QueryInstrumentation()
+        a_foreman = Foreman(self.dbsession)
+        an_instrumentation.attach(a_foreman)
+        an_instrumentation.attach(a_foreman.countries)
+
+        a_foreman.countries.get(1)
+        self.assertEqual(an_instrumentation.report()["methods"]["CountryWorker.get"]["calls"], 1)
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite is not installed")
+class TestAsyncInstrumentation(unittest.TestCase):
+    def test_report(self):
+        an_instrumentation = instrumentation.QueryInstrumentation()
+
+        async def run():
+            engine = create_async_engine("sqlite+aiosqlite://")
+            instrumentation.instrument_engine(engine)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+            async with AsyncSession(engine) as dbsession:
+                dbsession.add_all([Country(id=i, code="C{}".format(i)) for i in range(1, 4)])
+                await dbsession.commit()
+                dbsession.expunge_all()
+
+                a_foreman = AsyncForeman(dbsession)
+                an_instrumentation.attach(a_foreman)
+                self.assertEqual((await a_foreman.countries.get(1)).code, "C1")
+                await asyncio.gather(
+                    a_foreman.countries.get_many([2]), a_foreman.countries.get_many([3])
+                )
+
+            instrumentation.uninstrument_engine(engine)
+            await engine.dispose()
+
+        asyncio.run(run())
+
+        report = an_instrumentation.report()
+        self.assertEqual(report["statements"], 3)
+        methods = report["methods"]
+        self.assertEqual(methods["AsyncMappingManagingWorker.get"]["statements"], 1)
+        self.assertEqual(methods["AsyncMappingManagingWorker.get_many"]["calls"], 2)
+        self.assertEqual(methods["AsyncMappingManagingWorker.get_many"]["statements"], 2)
+        self.assertTrue(report["db_time"] > 0)
+
+
+class TestPhaseHistograms(unittest.TestCase):
+    def test_export(self):
+        histograms = instrumentation.PhaseHistograms(buckets=(0.1, 0.01))
+        histograms("Worker.create", 0.005, 0.02, None)
+        histograms("Worker.create", 0.5, 0.01, None)
+
+        self.assertEqual(
+            histograms.as_dict(),
+            {
+                "Worker.create": {
+                    "body": {
+                        "count": 2,
+                        "sum": 0.505,
+                        "buckets": [(0.01, 1), (0.1, 1), ("+Inf", 2)],
+                    },
+                    "flush": {
+                        "count": 2,
+                        "sum": 0.03,
+                        "buckets": [(0.01, 1), (0.1, 2), ("+Inf", 2)],
+                    },
+                }
+            },
+        )
+
+        lines = histograms.prometheus_text("db").splitlines()
+        self.assertEqual(lines[1], "# TYPE db histogram")
+        self.assertIn('db_bucket{method="Worker.create",phase="flush",le="0.1"} 2', lines)
+        self.assertIn('db_count{method="Worker.create",phase="body"} 2', lines)
+
+        histograms.reset()
+        self.assertEqual(histograms.as_dict(), {})
+
+    def test_db_method(self):
+        histograms = instrumentation.PhaseHistograms()
+        previous = database.set_timing_hook(histograms)
+        try:
+            engine = create_engine("sqlite:///:memory:", echo=False)
+            Base.metadata.create_all(engine)
+            a_foreman = Foreman(sessionmaker(bind=engine)())
+            a_foreman.countries.create(code="FR")
+        finally:
+            database.set_timing_hook(previous)
+
+        phases = histograms.as_dict()["CountryWorker.create"]
+        self.assertEqual(sorted(phases), ["body", "commit", "flush"])
+        self.assertEqual(phases["commit"]["count"], 1)
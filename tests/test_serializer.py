@@ -0,0 +1,133 @@
+import datetime
+import decimal
+import unittest
+import uuid
+
+from sqlalchemy import create_engine, event, Column, Date, ForeignKey, Integer, Numeric, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship, sessionmaker
+
+from yesaide import database, foreman, serializer, worker
+from yesaide.serializer import Field
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Country(Base):
+    __tablename__ = "countries"
+    id = Column(Integer, primary_key=True)
+    code = Column(String(2))
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    uuid = Column(database.GUIDType, default=uuid.uuid4)
+    created_on = Column(Date)
+    amount = Column(Numeric(10, 2))
+    description = Column(String(100))
+    country_id = Column(Integer, ForeignKey("countries.id"))
+    country = relationship(Country)
+
+    @property
+    def label(self):
+        return self.description
+
+
+fields = (
+    "id",
+    Field("uuid", convert=serializer.uuid_to_str),
+    Field("created_on", name="creation_date", convert=serializer.date_to_str),
+    Field("amount", convert=serializer.decimal_to_str),
+    Field("country.code", name="country"),
+)
+
+
+class Worker(worker.MappingManagingWorker):
+    serializer_fields = fields
+    serializer_load_only = True
+
+
+class TestCompileSerializer(unittest.TestCase):
+    def test_compile_serializer(self):
+        an_uuid = uuid.uuid4()
+        item = Mapping(
+            id=1,
+            uuid=an_uuid,
+            created_on=datetime.date(2020, 1, 2),
+            amount=decimal.Decimal("1.50"),
+            country=Country(code="FR"),
+        )
+
+        serialize = serializer.compile_serializer(fields)
+        self.assertEqual(
+            serialize(item),
+            {
+                "id": 1,
+                "uuid": str(an_uuid),
+                "creation_date": "2020-01-02",
+                "amount": "1.50",
+                "country": "FR",
+            },
+        )
+        self.assertIs(serializer.compile_serializer(list(fields)), serialize)
+
+    def test_compile_serializer_with_none(self):
+        serialize = serializer.compile_serializer(fields)
+        self.assertEqual(
+            serialize(Mapping(id=1)),
+            {"id": 1, "uuid": None, "creation_date": None, "amount": None, "country": None},
+        )
+
+    def test_invalid_field(self):
+        with self.assertRaises(ValueError):
+            Field("country..code")
+
+    def test_load_only_keys(self):
+        self.assertEqual(
+            serializer.load_only_keys(Mapping, fields),
+            ("id", "uuid", "created_on", "amount", "country_id"),
+        )
+        self.assertEqual(serializer.load_only_keys(Mapping, ("id", "label")), None)
+
+
+class TestWorkerSerializer(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+        self.dbsession = sessionmaker(bind=self.engine)()
+        self.dbsession.add(Mapping(id=1, description="bla", country=Country(code="FR")))
+        self.dbsession.commit()
+        self.dbsession.expunge_all()
+
+        self.worker = Worker(
+            foreman.RawForeman(dbsession=self.dbsession),
+            managed_sqla_map=Mapping,
+            managed_sqla_map_name="mapping",
+        )
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        self.dbsession.close()
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_serialize(self):
+        item = self.worker.get(1)
+        self.assertEqual(self.worker.serialize(item)["country"], "FR")
+
+    def test_load_only(self):
+        self.worker.get(1)
+        self.assertFalse("description" in self.statements[0])
+        self.assertTrue("country_id" in self.statements[0])
+
+        self.worker.get_many([1])
+        self.assertFalse("description" in self.statements[1])
+
+        list(self.worker.serialize_iter())
+        self.assertFalse("description" in self.statements[2])
@@ -2,9 +2,22 @@ import datetime
 import unittest
 import uuid
 
-from voluptuous import Schema, MultipleInvalid, Required, Invalid
-
-from yesaide import validation
+from voluptuous import (
+    ALLOW_EXTRA,
+    All,
+    Any,
+    Length,
+    PREVENT_EXTRA,
+    REMOVE_EXTRA,
+    Remove,
+    Schema,
+    MultipleInvalid,
+    Optional,
+    Required,
+    Invalid,
+)
+
+from yesaide import database, period, validation
 
 
 class TestUUID(unittest.TestCase):
@@ -12,6 +25,8 @@ class TestUUID(unittest.TestCase):
         self.assertTrue(validation.is_valid_uuid(uuid.uuid4()))
         self.assertTrue(validation.is_valid_uuid(str(uuid.uuid4())))
         self.assertFalse(validation.is_valid_uuid("bla"))
+        self.assertTrue(validation.is_valid_uuid(str(database.uuid7())))
+        self.assertFalse(validation.is_valid_uuid(str(uuid.uuid1())))
 
 
 class TestMail(unittest.TestCase):
@@ -118,6 +133,75 @@ class TestDateable(unittest.TestCase):
         with self.assertRaises(Invalid):
             schema("20151113")
 
+    def test_iso_shortcut(self):
+        schema = Schema(validation.Dateable())
+        for value in (
+            "2015-11-13",
+            "2015-1-05",
+            "2015-02-30",
+            "0000-01-01",
+            "2015-11-1x",
+            " 2015-11-1",
+        ):
+            try:
+                expected = datetime.datetime.strptime(value, "%Y-%m-%d").date()
+            except ValueError:
+                with self.assertRaises(MultipleInvalid):
+                    schema(value)
+            else:
+                self.assertEqual(schema(value), expected)
+
+        schema = Schema(validation.Dateable(cast=False))
+        self.assertEqual(schema("2015-11-13"), "2015-11-13")
+
+
+class TestDatetimeable(unittest.TestCase):
+    def test_cast(self):
+        schema = Schema(validation.Datetimeable())
+        paris = datetime.timezone(datetime.timedelta(hours=1))
+
+        self.assertEqual(
+            schema("2015-11-13T21:30:00+01:00"),
+            datetime.datetime(2015, 11, 13, 21, 30, tzinfo=paris),
+        )
+        self.assertEqual(
+            schema("2015-11-13T20:30:00.5Z"),
+            datetime.datetime(2015, 11, 13, 20, 30, 0, 500000, tzinfo=datetime.timezone.utc),
+        )
+
+        value = datetime.datetime(2015, 11, 13, 21, 30, tzinfo=paris)
+        self.assertIs(schema(value), value)
+
+    def test_period(self):
+        schema = Schema(validation.Datetimeable())
+        reference = schema("2015-11-30T23:30:00Z")
+
+        self.assertEqual(period.Month.from_reference_datetime(reference).first_day.month, 12)
+
+    def test_no_cast(self):
+        schema = Schema(validation.Datetimeable(cast=False))
+        self.assertEqual(schema("2015-11-13T21:30:00Z"), "2015-11-13T21:30:00Z")
+
+    def test_empty_to_none(self):
+        schema = Schema(validation.Datetimeable(empty_to_none=True))
+        self.assertIsNone(schema(""))
+
+    def test_invalid(self):
+        schema = Schema(validation.Datetimeable())
+        for value in (
+            "2015-11-13T21:30:00",
+            "2015-11-13",
+            datetime.datetime(2015, 11, 13),
+            datetime.date(2015, 11, 13),
+            "2015-11-13T21:30:00ZZ",
+            "bla",
+            "",
+            None,
+            3,
+        ):
+            with self.assertRaises(MultipleInvalid):
+                schema(value)
+
 
 class TestChoice(unittest.TestCase):
     def test_choice(self):
@@ -186,3 +270,232 @@ class TestSchemaDictNone(unittest.TestCase):
 
         with self.assertRaises(MultipleInvalid):
             schema(data)
+
+    def test_same_as_voluptuous(self):
+        schemas = [
+            validation.SchemaDictNone(self.schema_dict, not_none=("name",)),
+            validation.SchemaDictNone(self.schema_dict, extra=ALLOW_EXTRA),
+            validation.SchemaDictNone(self.schema_dict, extra=REMOVE_EXTRA),
+            validation.SchemaDictNone(self.schema_dict, required=True),
+            validation.SchemaDictNone(
+                {Required("id"): validation.Integeable(), Optional("name", default="x"): str}
+            ),
+        ]
+        payloads = [
+            {"id": 2, "name": "bla", "value": None},
+            {"id": "2", "name": "bla", "value": 3, "target": None},
+            {"id": 2, "name": None},
+            {"id": None, "name": "bla"},
+            {"name": "bla"},
+            {"id": 2, "value": "bla"},
+            {"id": 2, "other": 1, "other_none": None},
+        ]
+
+        for schema in schemas:
+            for payload in payloads:
+                try:
+                    expected = schema._call_voluptuous(payload)
+                except MultipleInvalid as exc:
+                    with self.assertRaises(MultipleInvalid) as cm:
+                        schema(payload)
+                    self.assertEqual(str(cm.exception), str(exc))
+                    self.assertEqual(cm.exception.path, exc.path)
+                else:
+                    result = schema(payload)
+                    self.assertEqual(result, expected)
+                    self.assertEqual(list(result), list(expected))
+
+    def test_required_with_all_and_any(self):
+        # Compiling `All()` / `Any()` values resets `schema.required`.
+        schema = validation.SchemaDictNone(
+            {"a": All(str, Length(min=1)), "b": Any(int, str), Optional("c"): int}, required=True
+        )
+        with self.assertRaises(MultipleInvalid) as cm:
+            schema({})
+        self.assertEqual(
+            sorted(str(error) for error in cm.exception.errors),
+            [
+                "required key not provided @ data['a']",
+                "required key not provided @ data['b']",
+            ],
+        )
+        self.assertEqual(schema({"a": "x", "b": 1}), {"a": "x", "b": 1})
+
+    def test_none_values_last(self):
+        schema = validation.SchemaDictNone(self.schema_dict)
+        data = {"value": None, "id": 2, "name": "bla"}
+
+        self.assertEqual(list(schema(data)), ["id", "name", "value"])
+        # The payload is left untouched.
+        self.assertEqual(list(data), ["value", "id", "name"])
+
+    def test_fast_path(self):
+        self.assertIsNotNone(validation.SchemaDictNone(self.schema_dict)._validators)
+        # Default values are left to voluptuous.
+        schema = validation.SchemaDictNone({Optional("name", default="x"): str})
+        self.assertIsNone(schema._validators)
+        self.assertEqual(schema({}), {"name": "x"})
+
+
+class TestCompileSchema(unittest.TestCase):
+    schema_dict = {
+        Required("id"): validation.Integeable(),
+        "mail": validation.Mail(lower=True),
+        "kind": validation.Choice(["a", "b"]),
+        "name": str,
+        "tags": [str],
+        Optional("count", default=lambda: 0): int,
+    }
+
+    payloads = [
+        {"id": "2", "mail": "A@B.FR", "kind": "a", "name": "x", "tags": ["t"]},
+        {"id": 2, "count": 3},
+        {"id": 2, "name": None, "kind": None},
+        {"id": None},
+        {"name": "x"},
+        {"id": "x", "kind": "c"},
+        {"id": 2, "name": 3},
+        {"id": 2, "tags": [1]},
+        {"id": 2, "other": 1},
+        {"id": 2, "other": None},
+        [],
+    ]
+
+    def check(self, schema, payloads=None):
+        compiled = validation.compile_schema(schema)
+        self.assertIsNot(compiled, schema)
+
+        for payload in payloads or self.payloads:
+            try:
+                expected = schema(payload)
+            except Exception as exc:
+                with self.assertRaises(type(exc)) as cm:
+                    compiled(payload)
+                self.assertEqual(str(cm.exception), str(exc))
+                self.assertEqual(getattr(cm.exception, "path", None), getattr(exc, "path", None))
+            else:
+                self.assertEqual(compiled(payload), expected)
+
+    def test_schema(self):
+        for extra in (PREVENT_EXTRA, ALLOW_EXTRA, REMOVE_EXTRA):
+            for required in (False, True):
+                self.check(Schema(self.schema_dict, required=required, extra=extra))
+
+    def test_schema_dict_none(self):
+        for extra in (PREVENT_EXTRA, ALLOW_EXTRA, REMOVE_EXTRA):
+            self.check(validation.SchemaDictNone(self.schema_dict, extra=extra))
+            self.check(validation.SchemaDictNone(self.schema_dict, not_none=["name"], extra=extra))
+
+    def test_required_with_all_and_any(self):
+        # Compiling `All()` / `Any()` values resets `schema.required`.
+        schema_dict = {"a": All(str, Length(min=1)), "b": Any(int, str), Optional("c"): int}
+        payloads = [{}, {"a": "x"}, {"a": "", "b": 1}, {"a": "x", "b": 1}, {"b": "y", "c": 2}]
+        for schema_class in (Schema, validation.SchemaDictNone):
+            self.check(schema_class(schema_dict, required=True), payloads)
+
+    def test_dict(self):
+        compiled = validation.compile_schema({"id": int})
+        self.assertEqual(compiled({"id": 1}), {"id": 1})
+        self.assertEqual(compiled.schema.schema, {"id": int})
+
+    def test_fallback(self):
+        schema = Schema({Remove("id"): int, "name": str})
+        self.assertIs(validation.compile_schema(schema), schema)
+
+        schema = Schema({int: str})
+        self.assertIs(validation.compile_schema(schema), schema)
+
+        schema = Schema([int])
+        self.assertIs(validation.compile_schema(schema), schema)
+
+
+class TestValidateMany(unittest.TestCase):
+    def build_schema_dict(self):
+        return {
+            Required("id"): validation.Integeable(),
+            "count": validation.Integeable(cast=False, empty_to_none=True),
+            "ratio": validation.Floatable(empty_to_none=True),
+            "price": validation.Decimable(),
+            "day": validation.Dateable(),
+            "compact_day": validation.Dateable(format="%Y%m%d"),
+            "kind": validation.Choice(["a", "b"]),
+            "name": str,
+            Optional("level", default=1): validation.Integeable(),
+        }
+
+    rows = [
+        {"id": "1", "ratio": "1.5", "price": "2.10", "day": "2015-11-13", "kind": "a"},
+        {"id": 2, "count": "", "ratio": "", "price": 0.1, "day": datetime.date(2015, 11, 13)},
+        {"id": "3", "count": "4", "compact_day": "20151113", "name": "x", "level": "2"},
+        {"id": " 3"},
+        {"id": "+3", "ratio": "nan", "price": "nan"},
+        {"id": "03", "ratio": "1_0", "price": "sNaN"},
+        {"id": "-0", "count": "x", "ratio": None},
+        {"id": 3.0, "day": "0000-01-01", "kind": "c"},
+        {"id": True, "day": "2015-1-05", "kind": []},
+        {"id": "99999999999999999999999", "day": "2015-02-30"},
+        {"id": "4", "day": "20151113", "compact_day": "2015-11-13"},
+        {"id": None, "kind": None, "name": None},
+        {"kind": "a", "other": 1},
+        {"id": "5", "level": "x"},
+        [],
+    ]
+
+    def errors(self, result):
+        return [
+            (i, sorted((str(error), error.path) for error in exc.errors))
+            for i, exc in result.errors
+        ]
+
+    def check(self, schema, rows):
+        result = validation.validate_many(schema, rows)
+
+        valid, errors = [], []
+        for i, row in enumerate(rows):
+            try:
+                valid.append(schema(row))
+            except MultipleInvalid as exc:
+                errors.append((i, sorted((str(error), error.path) for error in exc.errors)))
+        self.assertEqual(result.valid, valid)
+        self.assertEqual(self.errors(result), errors)
+        return result
+
+    def test_same_as_schema(self):
+        rows = self.rows
+        for extra in (PREVENT_EXTRA, ALLOW_EXTRA, REMOVE_EXTRA):
+            self.check(Schema(self.build_schema_dict(), extra=extra), rows[:-1])
+            self.check(validation.SchemaDictNone(self.build_schema_dict(), extra=extra), rows[:-1])
+        self.check(Schema(self.build_schema_dict()), rows)
+
+    def test_compiled_once(self):
+        schema = Schema(self.build_schema_dict())
+        validation.validate_many(schema, self.rows[:2])
+        validate = schema._ya_compiled
+        validation.validate_many(schema, self.rows[2:4])
+        self.assertIs(schema._ya_compiled, validate)
+
+    def test_result(self):
+        rows = [{"id": "1"}, {"id": "x"}, {"id": "2"}]
+        result = validation.validate_many({"id": validation.Integeable()}, rows)
+        self.assertEqual(result.valid, [{"id": 1}, {"id": 2}])
+        self.assertEqual([i for i, exc in result.errors], [1])
+        self.assertIsInstance(result.errors[0][1], MultipleInvalid)
+        self.assertEqual(result.errors[0][1].path, ["id"])
+        # The rows are left untouched.
+        self.assertEqual(rows[0], {"id": "1"})
+
+    def test_unexpected_exception(self):
+        rows = [{"mail": "a@b.fr"}, {"mail": 12}, {"mail": "c@d.fr"}]
+        result = validation.validate_many({"mail": validation.Mail()}, rows)
+        self.assertEqual(result.valid, [rows[0], rows[2]])
+        self.assertEqual([i for i, exc in result.errors], [1])
+
+        error = result.errors[0][1].errors[0]
+        self.assertIsInstance(error.__cause__, TypeError)
+        self.assertTrue(str(error).startswith("TypeError: "))
+        self.assertEqual(error.path, [])
+
+    def test_many_rows(self):
+        rows = [{"id": str(i), "day": "2015-11-{:02d}".format(i % 40)} for i in range(3000)]
+        result = self.check(Schema(self.build_schema_dict()), rows)
+        self.assertEqual(len(result.errors), 3000 - 75 * 30)
@@ -0,0 +1,159 @@
+import unittest
+import uuid
+from unittest import mock
+
+import voluptuous
+from sqlalchemy import create_engine, event, Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from yesaide import database, foreman, validation, worker
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    code = Column(String(10), unique=True, nullable=False)
+
+
+class MappingUUID(Base):
+    __tablename__ = "mappings_uuid"
+    uuid = Column(database.GUIDType, primary_key=True, default=database.uuid7)
+    other_uuid = Column("other", database.GUIDType)
+
+
+class MappingContextDefault(Base):
+    __tablename__ = "mappings_context_default"
+    key = Column(
+        String(20),
+        primary_key=True,
+        default=lambda context: "key-" + context.current_parameters["code"],
+    )
+    code = Column(String(10))
+
+
+a_schema = voluptuous.Schema({voluptuous.Required("code"): str, "id": validation.Integeable()})
+uuid_schema = voluptuous.Schema({"uuid": str, "other_uuid": str})
+
+
+class Foreman(foreman.RawForeman):
+    mappings = foreman.LazyWorker(worker.MappingManagingWorker, managed_sqla_map=Mapping)
+    uuids = foreman.LazyWorker(worker.MappingManagingWorker, managed_sqla_map=MappingUUID)
+    context_defaults = foreman.LazyWorker(
+        worker.MappingManagingWorker, managed_sqla_map=MappingContextDefault
+    )
+
+
+class TestCreateMany(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+        self.dbsession = sessionmaker(bind=self.engine)()
+        self.foreman = Foreman(self.dbsession)
+
+        self.inserts = 0
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        self.dbsession.close()
+
+    def _count(self, conn, cursor, statement, *args):
+        if statement.startswith("INSERT"):
+            self.inserts += 1
+
+    def codes(self):
+        return sorted(code for code, in self.dbsession.query(Mapping.code))
+
+    def test_batches(self):
+        rows = [{"code": "c{}".format(i)} for i in range(10)]
+        result = self.foreman.mappings.create_many(rows, a_schema, batch_size=4)
+
+        self.assertEqual(result.inserted, 10)
+        self.assertIsNone(result.ids)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(self.inserts, 3)
+        self.assertEqual(len(self.codes()), 10)
+
+    def test_returning(self):
+        rows = [{"code": "c{}".format(i)} for i in range(3)] + [{"code": "c3", "id": "42"}]
+        result = self.foreman.mappings.create_many(rows, a_schema, returning=True)
+        self.assertEqual(result.ids, [1, 2, 3, 42])
+
+        # Python default primary keys are generated beforehand.
+        other_uuid = uuid.uuid4()
+        rows = [{"other_uuid": str(other_uuid)} for _ in range(3)]
+        rows.append({"uuid": str(other_uuid)})
+        self.inserts = 0
+        result = self.foreman.uuids.create_many(rows, uuid_schema, returning=True)
+
+        # One `INSERT` per set of keys.
+        self.assertEqual(self.inserts, 2)
+        self.assertEqual(result.ids[:3], sorted(result.ids[:3]))
+        self.assertEqual(result.ids[3], other_uuid)
+        self.assertEqual(
+            self.dbsession.query(MappingUUID).get(result.ids[0]).other_uuid, other_uuid
+        )
+
+    def test_context_default(self):
+        # Defaults taking an execution context are left to the `INSERT`.
+        rows = [{"code": "c0"}, {"code": "c1"}]
+        schema = voluptuous.Schema({"code": str})
+        result = self.foreman.context_defaults.create_many(rows, schema, returning=True)
+        self.assertEqual(result.ids, ["key-c0", "key-c1"])
+        self.assertEqual(
+            sorted(key for key, in self.dbsession.query(MappingContextDefault.key)),
+            ["key-c0", "key-c1"],
+        )
+
+    def test_executemany_returning(self):
+        # Force the `RETURNING` path of dialects such as psycopg2, which
+        # SQLAlchemy doesn't enable for SQLite.
+        def returning_clause(compiler, stmt, returning_cols, **kwargs):
+            return " RETURNING " + ", ".join(
+                compiler.preparer.format_column(column) for column in returning_cols
+            )
+
+        dialect = self.engine.dialect
+        with mock.patch.object(dialect, "insert_executemany_returning", True), mock.patch.object(
+            dialect.statement_compiler, "returning_clause", returning_clause
+        ):
+            rows = [{"code": "c{}".format(i)} for i in range(3)]
+            result = self.foreman.mappings.create_many(rows, a_schema, batch_size=1, returning=True)
+
+        self.assertEqual(result.ids, [1, 2, 3])
+        self.assertEqual(self.codes(), ["c0", "c1", "c2"])
+
+    def test_validation_error(self):
+        rows = [{"code": "c0"}, {"code": 1}]
+        with self.assertRaises(voluptuous.MultipleInvalid) as cm:
+            self.foreman.mappings.create_many(rows, a_schema)
+        self.assertEqual(cm.exception.path, [1, "code"])
+        self.assertEqual(self.inserts, 0)
+
+    def test_isolate_errors(self):
+        self.foreman.mappings.create_many([{"code": "c3"}], a_schema)
+
+        rows = [{"code": "c{}".format(i)} for i in range(6)]
+        rows[1]["code"] = 1
+        rows[4]["code"] = "c0"
+        result = self.foreman.mappings.create_many(
+            rows, a_schema, batch_size=3, returning=True, isolate_errors=True
+        )
+
+        self.assertEqual(result.inserted, 3)
+        self.assertEqual([index for index, _ in result.errors], [1, 3, 4])
+        self.assertIsInstance(result.errors[0][1], voluptuous.Invalid)
+        self.assertEqual(
+            [i is not None for i in result.ids], [True, False, True, False, False, True]
+        )
+        self.assertEqual(self.codes(), ["c0", "c2", "c3", "c5"])
+
+    def test_error(self):
+        rows = [{"code": "c0"}, {"code": "c0"}]
+        with self.assertRaises(Exception):
+            self.foreman.mappings.create_many(rows, a_schema)
+        self.dbsession.rollback()
+        self.assertEqual(self.codes(), [])
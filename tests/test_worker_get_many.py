@@ -0,0 +1,117 @@
+import unittest
+import uuid
+
+from sqlalchemy import create_engine, event, Column, Integer, String
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.ext.declarative import declarative_base
+
+from yesaide import database, foreman, worker
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    status = Column(String(10), default="active")
+
+
+class MappingUUID(Base):
+    __tablename__ = "mappings_uuid"
+    uuid = Column(database.GUIDType, primary_key=True, default=uuid.uuid4)
+
+
+class MappingRawUUID(Base):
+    __tablename__ = "mappings_raw_uuid"
+    uuid = Column(database.GUIDType(raw=True), primary_key=True)
+
+
+class ActiveWorker(worker.MappingManagingWorker):
+    def base_query(self, **kwargs):
+        return self._dbsession.query(self._sqla_map).filter(self._sqla_map.status == "active")
+
+
+class TestWorkerGetMany(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+
+        self.dbsession = sessionmaker(bind=self.engine)()
+        a_foreman = foreman.RawForeman(dbsession=self.dbsession)
+        self.worker = ActiveWorker(
+            a_foreman, managed_sqla_map=Mapping, managed_sqla_map_name="mapping"
+        )
+        self.uuid_worker = worker.MappingManagingWorker(
+            a_foreman, managed_sqla_map=MappingUUID, managed_sqla_map_name="mapping"
+        )
+
+        for i in range(1, 11):
+            self.dbsession.add(Mapping(id=i, status="active" if i != 5 else "inactive"))
+        self.uuids = [uuid.uuid4() for _ in range(3)]
+        for an_uuid in self.uuids:
+            self.dbsession.add(MappingUUID(uuid=an_uuid))
+            self.dbsession.add(MappingRawUUID(uuid=an_uuid.hex))
+        self.dbsession.commit()
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        self.dbsession.close()
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_get_many_keeps_order(self):
+        objs = self.worker.get_many([3, 1, 2, 1])
+        self.assertEqual([o.id for o in objs], [3, 1, 2, 1])
+        self.assertEqual(len(self.statements), 1)
+
+    def test_get_many_chunks(self):
+        self.worker.get_many_chunk_size = 3
+        objs = self.worker.get_many([1, 2, 3, 4, 6, 7, 8])
+        self.assertEqual([o.id for o in objs], [1, 2, 3, 4, 6, 7, 8])
+        self.assertEqual(len(self.statements), 3)
+
+    def test_get_many_empty(self):
+        self.assertEqual(self.worker.get_many([]), [])
+        self.assertEqual(self.statements, [])
+
+    def test_get_many_missing(self):
+        # 5 is filtered out by `base_query()`, 42 does not exist.
+        with self.assertRaises(NoResultFound):
+            self.worker.get_many([1, 5])
+
+        objs = self.worker.get_many([1, 5, 42, 2], missing="skip")
+        self.assertEqual([o.id for o in objs], [1, 2])
+
+        objs = self.worker.get_many([1, 5, 42, 2], missing="none")
+        self.assertEqual([o and o.id for o in objs], [1, None, None, 2])
+
+        with self.assertRaises(ValueError):
+            self.worker.get_many([1], missing="wrong")
+
+    def test_get_many_uuid(self):
+        ids = [str(self.uuids[2]), self.uuids[0]]
+        objs = self.uuid_worker.get_many(ids)
+        self.assertEqual([o.uuid for o in objs], [self.uuids[2], self.uuids[0]])
+
+    def test_raw_uuids(self):
+        raw_worker = worker.MappingManagingWorker(
+            self.worker._ya_supervisor, managed_sqla_map=MappingRawUUID, managed_sqla_map_name="m"
+        )
+        ids = [self.uuids[2].hex, str(self.uuids[0]), self.uuids[1]]
+        expected = [self.uuids[2].hex, self.uuids[0].hex, self.uuids[1].hex]
+
+        objs = raw_worker.get_many(ids)
+        self.assertEqual([m.uuid for m in objs], expected)
+        self.assertEqual(raw_worker.get(str(self.uuids[0])).uuid, self.uuids[0].hex)
+
+        # Objects are held by `objs` in the (weak) identity map.
+        raw_worker.use_identity_map = True
+        self.statements.clear()
+        self.assertEqual([m.uuid for m in raw_worker.get_many(ids)], expected)
+        self.assertEqual(self.statements, [])
@@ -0,0 +1,129 @@
+import unittest
+
+from sqlalchemy import create_engine, event, Column, Integer, String
+from sqlalchemy.orm import defaultload, sessionmaker
+from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.ext.declarative import declarative_base
+
+from yesaide import database, foreman, worker
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    status = Column(String(10), default="active")
+
+
+class ActiveWorker(worker.MappingManagingWorker):
+    use_identity_map = True
+
+    def base_query(self, **kwargs):
+        return self._dbsession.query(self._sqla_map).filter(self._sqla_map.status == "active")
+
+    def identity_map_predicate(self, sqla_obj, **kwargs):
+        return sqla_obj.status == "active"
+
+
+class TestWorkerIdentityMap(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+
+        self.dbsession = sessionmaker(bind=self.engine)()
+        a_foreman = foreman.RawForeman(dbsession=self.dbsession)
+        self.worker = ActiveWorker(
+            a_foreman, managed_sqla_map=Mapping, managed_sqla_map_name="mapping"
+        )
+
+        self.dbsession.add_all([Mapping(id=1), Mapping(id=2), Mapping(id=3, status="inactive")])
+        self.dbsession.commit()
+        self.dbsession.expunge_all()
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        self.dbsession.close()
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_get_hits_identity_map(self):
+        first = self.worker.get(1)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual((self.worker.identity_map_hits, self.worker.identity_map_misses), (0, 1))
+
+        second = self.worker.get(1)
+        self.assertIs(first, second)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual((self.worker.identity_map_hits, self.worker.identity_map_misses), (1, 1))
+
+    def test_get_applies_predicate(self):
+        self.dbsession.query(Mapping).all()
+        self.statements = []
+
+        with self.assertRaises(NoResultFound):
+            self.worker.get(3)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.worker.identity_map_misses, 1)
+
+    def test_expired_objects_are_misses(self):
+        first = self.worker.get(1)
+        self.dbsession.commit()
+        with self.engine.begin() as connection:
+            connection.execute(Mapping.__table__.update().values(status="other"))
+        self.statements = []
+
+        # Refreshed by the query, and filtered out by `base_query()`.
+        with self.assertRaises(NoResultFound):
+            self.worker.get(1)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.worker.identity_map_misses, 2)
+
+        a_worker = worker.MappingManagingWorker(
+            foreman.RawForeman(dbsession=self.dbsession), managed_sqla_map=Mapping
+        )
+        a_worker.use_identity_map = True
+        self.assertIs(a_worker.get(1), first)
+        self.assertEqual(first.status, "other")
+
+        self.dbsession.commit()
+        with self.engine.begin() as connection:
+            connection.execute(Mapping.__table__.delete())
+        with self.assertRaises(NoResultFound):
+            a_worker.get(1)
+        self.assertEqual(a_worker.identity_map_hits, 0)
+
+    def test_get_with_options_bypasses_identity_map(self):
+        # Keep a reference, the identity map is weak-referencing.
+        first = self.worker.get(1)  # noqa: F841
+        self.worker.get(1, options=[])
+        self.worker.get(1, options=[defaultload(Mapping.status)])
+        self.assertEqual(len(self.statements), 2)
+
+    def test_disabled_by_default(self):
+        a_worker = worker.MappingManagingWorker(
+            foreman.RawForeman(dbsession=self.dbsession), managed_sqla_map=Mapping
+        )
+        a_worker.get(1)
+        a_worker.get(1)
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual(a_worker.identity_map_hits, 0)
+
+    def test_get_many_only_fetches_unknown_ids(self):
+        # Keep a reference, the identity map is weak-referencing.
+        first = self.worker.get(1)  # noqa: F841
+        self.statements = []
+
+        objs = self.worker.get_many([2, 1])
+        self.assertEqual([o.id for o in objs], [2, 1])
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.worker.identity_map_hits, 1)
+
+        self.worker.get_many([2, 1])
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.worker.identity_map_hits, 3)
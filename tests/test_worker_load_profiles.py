@@ -0,0 +1,104 @@
+import unittest
+
+from sqlalchemy import create_engine, event, Column, ForeignKey, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship, selectinload, sessionmaker
+
+from yesaide import cache, database, foreman, worker
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Country(Base):
+    __tablename__ = "countries"
+    id = Column(Integer, primary_key=True)
+    code = Column(String(2))
+
+
+class City(Base):
+    __tablename__ = "cities"
+    id = Column(Integer, primary_key=True)
+    country_id = Column(Integer, ForeignKey("countries.id"))
+    country = relationship(Country, backref="cities")
+
+
+class CityWorker(worker.MappingManagingWorker):
+    load_profiles = {"list": [selectinload(City.country)]}
+
+    def __init__(self, a_foreman):
+        worker.MappingManagingWorker.__init__(
+            self, a_foreman, managed_sqla_map=City, managed_sqla_map_name="city"
+        )
+
+    def serialize(self, item):
+        return {"id": item.id, "country": item.country.code}
+
+
+class Foreman(foreman.RawForeman):
+    cities = foreman.LazyWorker(CityWorker)
+
+
+class TestLoadProfiles(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+        self.dbsession = sessionmaker(bind=self.engine)()
+        self.foreman = Foreman(self.dbsession)
+
+        countries = [Country(id=i, code="C{}".format(i)) for i in range(1, 6)]
+        self.dbsession.add_all([City(id=i, country=countries[i - 1]) for i in range(1, 6)])
+        self.dbsession.commit()
+        self.dbsession.expunge_all()
+
+        self.statements = 0
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        self.dbsession.close()
+
+    def _count(self, *args):
+        self.statements += 1
+
+    def serialize(self, cities):
+        return [self.foreman.cities.serialize(city) for city in cities]
+
+    def test_get_many(self):
+        self.serialize(self.foreman.cities.get_many([1, 2, 3]))
+        self.assertEqual(self.statements, 4)
+
+        self.dbsession.expunge_all()
+        self.statements = 0
+        serialized = self.serialize(self.foreman.cities.get_many([1, 2, 3], profile="list"))
+        self.assertEqual(serialized[2], {"id": 3, "country": "C3"})
+        self.assertEqual(self.statements, 2)
+
+    def test_serialize_iter(self):
+        serialized = list(self.foreman.cities.serialize_iter(profile="list", chunk_size=2))
+        self.assertEqual(len(serialized), 5)
+        self.assertEqual(self.statements, 4)
+
+    def test_get_and_paginate(self):
+        city = self.foreman.cities.get(1, profile="list")
+        self.assertEqual(self.statements, 2)
+        self.assertIn("country", city.__dict__)
+
+        page = self.foreman.cities.paginate(limit=2, profile="list")
+        self.serialize(page)
+        self.assertEqual(self.statements, 4)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            self.foreman.cities.get_many([1], profile="detail")
+
+    def test_get_bypasses_identity_map_and_cache(self):
+        cities = self.foreman.cities
+        cities.cache_backend = cache.LRUCache()
+        cities.use_identity_map = True
+
+        city = cities.get(1)
+        self.statements = 0
+        self.assertIs(cities.get(1, profile="list"), city)
+        self.assertEqual(self.statements, 2)
+        self.assertIn("country", city.__dict__)
+        self.assertEqual((cities.cache_hits, cities.cache_misses), (0, 1))
@@ -0,0 +1,161 @@
+import base64
+import datetime
+import json
+import unittest
+import uuid
+
+from sqlalchemy import create_engine, event, Column, Boolean, DateTime, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from yesaide import database, foreman, pagination, worker
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    label = Column("name", String(10))
+    created_at = Column(DateTime)
+    is_active = Column(Boolean, default=True)
+
+
+class MappingUUID(Base):
+    __tablename__ = "mappings_uuid"
+    uuid = Column(database.GUIDType, primary_key=True, default=database.uuid7)
+
+
+class MappingWorker(worker.MappingManagingWorker):
+    paginate_order_by = ("-created_at",)
+
+    def __init__(self, a_foreman):
+        worker.MappingManagingWorker.__init__(
+            self, a_foreman, managed_sqla_map=Mapping, managed_sqla_map_name="mapping"
+        )
+
+    def base_query(self, **kwargs):
+        return worker.MappingManagingWorker.base_query(self).filter(Mapping.is_active.is_(True))
+
+
+class Foreman(foreman.RawForeman):
+    mappings = foreman.LazyWorker(MappingWorker)
+    uuids = foreman.LazyWorker(worker.MappingManagingWorker, managed_sqla_map=MappingUUID)
+
+
+class TestPaginate(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+        self.dbsession = sessionmaker(bind=self.engine)()
+        self.foreman = Foreman(self.dbsession)
+
+        start = datetime.datetime(2020, 1, 1)
+        self.dbsession.add_all(
+            [
+                Mapping(
+                    id=i,
+                    label="name{}".format(i % 3),
+                    created_at=start + datetime.timedelta(days=i // 2),
+                    is_active=i != 7,
+                )
+                for i in range(1, 21)
+            ]
+        )
+        self.dbsession.commit()
+
+    def tearDown(self):
+        self.dbsession.close()
+
+    def pages(self, a_worker, **kwargs):
+        pages = []
+        after = None
+        while True:
+            page = a_worker.paginate(after=after, **kwargs)
+            pages.append([item for item in page])
+            if not page.has_more:
+                return pages
+            after = page.next_cursor
+
+    def test_id(self):
+        pages = self.pages(self.foreman.mappings, limit=5, order_by=[])
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 4])
+        ids = [m.id for page in pages for m in page]
+        # Filters of `base_query()` are kept.
+        self.assertEqual(ids, [i for i in range(1, 21) if i != 7])
+
+        # Exact multiple of the limit: no empty last page.
+        pages = self.pages(self.foreman.mappings, limit=19, order_by=[])
+        self.assertEqual([len(page) for page in pages], [19])
+
+    def test_default_order_by(self):
+        ids = [m.id for page in self.pages(self.foreman.mappings, limit=3) for m in page]
+        expected = sorted((i for i in range(1, 21) if i != 7), key=lambda i: (-(i // 2), -i))
+        self.assertEqual(ids, expected)
+
+    def test_mixed_directions(self):
+        for order_by in (["label", "-id"], [Mapping.label.asc(), Mapping.id.desc()]):
+            pages = self.pages(self.foreman.mappings, limit=4, order_by=order_by)
+            ids = [m.id for page in pages for m in page]
+            expected = sorted(
+                (i for i in range(1, 21) if i != 7), key=lambda i: ("name{}".format(i % 3), -i)
+            )
+            self.assertEqual(ids, expected)
+
+    def test_no_offset(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, *args):
+            statements.append((statement, parameters))
+
+        event.listen(self.engine, "before_cursor_execute", before_cursor_execute)
+        self.pages(self.foreman.mappings, limit=5)
+        event.remove(self.engine, "before_cursor_execute", before_cursor_execute)
+
+        self.assertEqual(len(statements), 4)
+        # SQLite always renders `LIMIT ? OFFSET ?`: check the offset.
+        self.assertEqual([parameters[-1] for _, parameters in statements], [0, 0, 0, 0])
+        self.assertIn("(mappings.created_at, mappings.id) < (?, ?)", statements[-1][0])
+
+    def test_uuid(self):
+        uuids = [database.uuid7() for _ in range(5)]
+        self.dbsession.add_all([MappingUUID(uuid=u) for u in uuids])
+        self.dbsession.commit()
+
+        pages = self.pages(self.foreman.uuids, limit=2)
+        self.assertEqual([m.uuid for page in pages for m in page], uuids)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(pagination.InvalidCursorError):
+            self.foreman.mappings.paginate(after="not a cursor")
+
+        cursor = self.foreman.mappings.paginate(limit=2).next_cursor
+        with self.assertRaises(pagination.InvalidCursorError):
+            self.foreman.mappings.paginate(after=cursor, order_by=["label"])
+
+        with self.assertRaises(ValueError):
+            self.foreman.mappings.paginate(limit=0)
+
+
+class TestCursor(unittest.TestCase):
+    def test_roundtrip(self):
+        keys = pagination.sort_keys(Mapping, ["id", "label", "created_at", "is_active"])
+        values = [1, "name", datetime.datetime(2020, 1, 1, 12, 30), False]
+
+        cursor = pagination.encode_cursor(keys, values)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(pagination.decode_cursor(keys, cursor), values)
+
+        keys = pagination.sort_keys(MappingUUID, ["uuid"])
+        an_uuid = uuid.uuid4()
+        cursor = pagination.encode_cursor(keys, [an_uuid])
+        self.assertEqual(pagination.decode_cursor(keys, cursor), [an_uuid])
+
+    def test_tampered(self):
+        keys = pagination.sort_keys(Mapping, ["id"])
+        for tagged_value in (["n", "abc"], ["i", "abc"], ["x", 1], ["u", 1], "i"):
+            document = json.dumps({"k": ["id"], "v": [tagged_value]})
+            cursor = base64.urlsafe_b64encode(document.encode("utf-8")).decode("ascii")
+            with self.assertRaises(pagination.InvalidCursorError):
+                pagination.decode_cursor(keys, cursor)
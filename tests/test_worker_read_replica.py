@@ -0,0 +1,154 @@
+import unittest
+
+from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from yesaide import YesaideRuntimeError, cache, database, foreman, worker
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    origin = Column(String(10))
+
+
+class MappingWorker(worker.MappingManagingWorker):
+    serializer_fields = ("id", "origin")
+
+    def __init__(self, a_foreman):
+        worker.MappingManagingWorker.__init__(
+            self, a_foreman, managed_sqla_map=Mapping, managed_sqla_map_name="mapping"
+        )
+
+    @database.db_method
+    def rename(self, mapping_id, origin):
+        a_mapping = self.get(mapping_id)
+        a_mapping.origin = origin
+        return a_mapping
+
+    @database.db_method
+    def set_origin(self, a_mapping, origin):
+        a_mapping.origin = origin
+
+
+class Foreman(foreman.RawForeman):
+    mappings = foreman.LazyWorker(MappingWorker)
+
+
+class TestReadReplica(unittest.TestCase):
+    def setUp(self):
+        # Two databases holding different data, to tell where each read
+        # went.
+        self.sessions = {}
+        self.factories = {}
+        for origin in ("primary", "replica"):
+            engine = create_engine("sqlite:///:memory:", echo=False)
+            Base.metadata.create_all(engine)
+            self.factories[origin] = sessionmaker(bind=engine)
+            dbsession = self.factories[origin]()
+            dbsession.add_all([Mapping(id=i, origin=origin) for i in range(1, 4)])
+            dbsession.commit()
+            self.sessions[origin] = dbsession
+
+        self.foreman = Foreman(self.sessions["primary"], read_dbsession=self.sessions["replica"])
+
+    def tearDown(self):
+        for dbsession in self.sessions.values():
+            dbsession.close()
+
+    def test_reads(self):
+        workers = self.foreman.mappings
+
+        self.assertEqual(workers.get(1).origin, "replica")
+        self.assertEqual([m.origin for m in workers.get_many([2, 3])], ["replica", "replica"])
+        self.assertEqual(
+            [m["origin"] for m in workers.serialize_iter()], ["replica", "replica", "replica"]
+        )
+
+        self.assertEqual(workers.get(1, use_primary=True).origin, "primary")
+        self.assertEqual(workers.get_many([2], use_primary=True)[0].origin, "primary")
+        self.assertEqual(next(workers.serialize_iter(use_primary=True))["origin"], "primary")
+
+    def test_writes_stay_on_primary(self):
+        workers = self.foreman.mappings
+
+        self.assertEqual(workers.rename(1, "renamed").origin, "renamed")
+        self.assertEqual(workers.get(1).origin, "replica")
+        self.assertEqual(workers.get(1, use_primary=True).origin, "renamed")
+        self.assertEqual(self.sessions["primary"]._ya_db_method_depth, 0)
+
+        with workers.transaction():
+            self.assertEqual(workers.get(2).origin, "primary")
+        self.assertEqual(workers.get(2).origin, "replica")
+
+    def test_factory(self):
+        a_foreman = Foreman(self.sessions["primary"], read_dbsession=self.factories["replica"])
+        self.assertEqual(a_foreman.mappings.get(1).origin, "replica")
+
+        read_dbsession = a_foreman.read_dbsession()
+        self.assertIs(a_foreman.mappings.read_dbsession(), read_dbsession)
+        self.assertEqual(a_foreman.mappings.get(2).origin, "replica")
+        read_dbsession.close()
+
+    def test_no_replica(self):
+        a_foreman = Foreman(self.sessions["primary"])
+        self.assertIsNone(a_foreman.read_dbsession())
+        self.assertEqual(a_foreman.mappings.get(1).origin, "primary")
+
+    def test_replica_objects_are_read_only(self):
+        workers = self.foreman.mappings
+
+        a_mapping = workers.get(1)
+        with self.assertRaises(YesaideRuntimeError):
+            workers.set_origin(a_mapping, "renamed")
+        self.assertEqual(a_mapping.origin, "replica")
+        self.assertFalse(self.sessions["replica"].dirty)
+
+        a_mapping = workers.get(2)
+        with self.assertRaises(YesaideRuntimeError):
+            with workers.transaction():
+                a_mapping.origin = "renamed"
+        self.assertFalse(self.sessions["replica"].dirty)
+
+        a_mapping = workers.get(1, use_primary=True)
+        workers.set_origin(a_mapping, "renamed")
+        self.sessions["primary"].expire_all()
+        self.assertEqual(workers.get(1, use_primary=True).origin, "renamed")
+
+    def test_foreman_without_read_dbsession(self):
+        class DuckForeman(object):
+            def __init__(self, dbsession):
+                self._dbsession = dbsession
+
+        class UninitializedForeman(foreman.RawForeman):
+            mappings = foreman.LazyWorker(MappingWorker)
+
+            def __init__(self, dbsession):
+                self._dbsession = dbsession
+
+        for i, foreman_class in enumerate((DuckForeman, UninitializedForeman), 1):
+            workers = MappingWorker(foreman_class(self.sessions["primary"]))
+            self.assertIsNone(workers.read_dbsession())
+            self.assertEqual(workers.get(i).origin, "primary")
+            workers.set_origin(workers.get(i), "renamed")
+
+    def test_cache(self):
+        workers = self.foreman.mappings
+        workers.cache_backend = cache.LRUCache()
+
+        # Reads of the replica don't fill the cache.
+        self.assertEqual(workers.get(1).origin, "replica")
+        self.sessions["replica"].expunge_all()
+        self.assertEqual(workers.get(1).origin, "replica")
+        self.assertEqual((workers.cache_hits, workers.cache_misses), (0, 2))
+
+        self.assertEqual(workers.get(1, use_primary=True).origin, "primary")
+        self.sessions["replica"].expunge_all()
+
+        a_mapping = workers.get(1)
+        self.assertEqual(workers.cache_hits, 1)
+        self.assertIn(a_mapping, self.sessions["replica"])
@@ -1,7 +1,7 @@
 import unittest
 import uuid
 
-from sqlalchemy import create_engine, Column, Integer
+from sqlalchemy import create_engine, event, Column, Integer
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from voluptuous import Schema
@@ -26,11 +26,14 @@ schema = Schema({"mapping": Mapping})
 
 schema_uuid = Schema({"mapping": MappingUUID})
 
+schema_both = Schema({"mapping": Mapping, "other_mapping": Mapping, "mapping_uuid": MappingUUID})
+
 
 class TestWorkerResolveID(unittest.TestCase):
     def setUp(self):
         engine = create_engine("sqlite:///:memory:", echo=False)
         Base.metadata.create_all(engine)
+        self.engine = engine
 
         Session = sessionmaker(bind=engine)
         dbsession = Session()
@@ -82,3 +85,56 @@ class TestWorkerResolveID(unittest.TestCase):
         )
 
         self.assertEqual(a_second_dict["mapping"], None)
+
+    def test_resolve_id_not_found(self):
+        with self.assertRaises(mapping.ResolveIdError) as cm:
+            mapping.resolve_id(self.build_query, {"mapping_id": 42}, schema=schema)
+        self.assertEqual(cm.exception.errors, [(0, "mapping", 42)])
+
+    def test_resolve_id_with_id_and_uuid(self):
+        with self.assertRaises(Exception):
+            mapping.resolve_id(
+                self.build_query, {"mapping_id": 1, "mapping_uuid": uuid.uuid4()}, schema=schema
+            )
+
+    def test_resolve_many(self):
+        an_uuid = uuid.uuid4()
+        self.worker._dbsession.add_all([Mapping(id=1), Mapping(id=2), MappingUUID(uuid=an_uuid)])
+        self.worker._dbsession.commit()
+
+        statements = []
+        counter = lambda *args: statements.append(args[2])
+        event.listen(self.engine, "before_cursor_execute", counter)
+
+        dicts = [
+            {"mapping_id": 1, "other_mapping_id": 2, "mapping_uuid_uuid": str(an_uuid)},
+            {"mapping_id": 2, "other_mapping_id": None, "name": "bla"},
+            {"mapping": "already there", "other_mapping_id": 1},
+        ]
+        resolved = mapping.resolve_many(self.build_query, dicts, schema_both, allow_none_id=True)
+        event.remove(self.engine, "before_cursor_execute", counter)
+
+        # One query for `Mapping` and one for `MappingUUID`.
+        self.assertEqual(len(statements), 2)
+
+        self.assertEqual(resolved[0]["mapping"].id, 1)
+        self.assertEqual(resolved[0]["other_mapping"].id, 2)
+        self.assertEqual(resolved[0]["mapping_uuid"].uuid, an_uuid)
+        self.assertEqual(resolved[1]["mapping"].id, 2)
+        self.assertEqual(resolved[1]["other_mapping"], None)
+        self.assertEqual(resolved[1]["name"], "bla")
+        self.assertEqual(resolved[2]["mapping"], "already there")
+        self.assertEqual(resolved[2]["other_mapping"].id, 1)
+        self.assertFalse("mapping_id" in resolved[0])
+
+        # Input dicts are left untouched.
+        self.assertTrue("mapping_id" in dicts[0])
+
+    def test_resolve_many_not_found(self):
+        self.worker._dbsession.add(Mapping(id=1))
+        self.worker._dbsession.commit()
+
+        dicts = [{"mapping_id": 1}, {"mapping_id": 42}, {"other_mapping_id": 43}]
+        with self.assertRaises(mapping.ResolveIdError) as cm:
+            mapping.resolve_many(self.build_query, dicts, schema_both)
+        self.assertEqual(cm.exception.errors, [(1, "mapping", 42), (2, "other_mapping", 43)])
@@ -1,8 +1,23 @@
-from yesaide import worker
+import unittest
+
+from sqlalchemy import create_engine, Column, Integer
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from yesaide import database, foreman, worker
 
 import test_worker
 
 
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    a_prop = Column(Integer)
+
+
 class InvalidWorker(worker.MappingManagingWorker):
     pass
 
@@ -41,3 +56,51 @@ class TestSerialize(test_worker.BaseTestWorker):
 
         self.assertTrue(isinstance(serialized, dict))
         self.assertEqual(serialized["a_prop"], fake_item.a_prop)
+
+
+class TestSerializeIter(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(engine)
+        self.dbsession = sessionmaker(bind=engine)()
+        self.dbsession.add_all([Mapping(id=i, a_prop=i * 2) for i in range(1, 26)])
+        self.dbsession.commit()
+        self.dbsession.expunge_all()
+
+        self.a_worker = Worker(
+            foreman.RawForeman(dbsession=self.dbsession),
+            managed_sqla_map=Mapping,
+            managed_sqla_map_name="mapping",
+        )
+
+    def tearDown(self):
+        self.dbsession.close()
+
+    def test_serialize_iter(self):
+        max_in_session = 0
+        serialized = []
+
+        for item in self.a_worker.serialize_iter(chunk_size=10):
+            serialized.append(item)
+            max_in_session = max(max_in_session, len(self.dbsession.identity_map))
+
+        self.assertEqual(serialized, [{"a_prop": i * 2} for i in range(1, 26)])
+        self.assertTrue(max_in_session <= 10)
+        self.assertEqual(len(self.dbsession.identity_map), 0)
+
+    def test_serialize_iter_with_query(self):
+        query = self.dbsession.query(Mapping).filter(Mapping.id > 20).order_by(Mapping.id)
+        serialized = list(self.a_worker.serialize_iter(query=query, chunk_size=2))
+        self.assertEqual(serialized, [{"a_prop": i * 2} for i in range(21, 26)])
+
+    def test_serialize_iter_keeps_known_objects(self):
+        known = self.dbsession.query(Mapping).get(3)
+        modified = self.dbsession.query(Mapping).get(4)
+        modified.a_prop = 0
+
+        serialized = list(self.a_worker.serialize_iter(chunk_size=2))
+
+        self.assertEqual(serialized[2:4], [{"a_prop": 6}, {"a_prop": 0}])
+        self.assertTrue(known in self.dbsession)
+        self.assertTrue(modified in self.dbsession)
+        self.assertEqual(len(self.dbsession.identity_map), 2)
@@ -1,6 +1,11 @@
+import unittest
+
 import voluptuous
+from sqlalchemy import create_engine, event, Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
 
-from yesaide import mapping
+from yesaide import database, mapping
 
 import test_worker
 
@@ -26,3 +31,74 @@ class TestWorkerUpdate(test_worker.BaseTestWorker):
         update = mapping.update(sqla_obj=an_object, schema=a_schema, a_req_prop="bb")
         self.assertEqual(an_object.a_req_prop, "bb")
         self.assertTrue(update)
+
+
+Base = declarative_base(cls=database.MetaBase)
+
+
+class Mapping(Base):
+    __tablename__ = "mappings"
+    id = Column(Integer, primary_key=True)
+    a_prop = Column(Integer)
+    a_req_prop = Column(String(10))
+
+
+class TestWorkerUpdateMany(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(self.engine)
+        self.dbsession = sessionmaker(bind=self.engine)()
+
+        self.objects = [Mapping(id=i, a_prop=i, a_req_prop="bla") for i in range(1, 5)]
+        self.dbsession.add_all(self.objects)
+        self.dbsession.commit()
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        self.dbsession.close()
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            self.statements.append((statement, executemany))
+
+    def test_update_many(self):
+        obj1, obj2, obj3, obj4 = self.objects
+        changed = mapping.update_many(
+            [
+                (obj1, {"a_prop": 10}),
+                (obj2, {"a_prop": 20}),
+                (obj3, {"a_prop": 3}),
+                (obj4, {"a_prop": 40, "a_req_prop": "bli"}),
+            ],
+            a_schema,
+        )
+
+        self.assertEqual(changed, [obj1, obj2, obj4])
+        # One executemany for `a_prop` and one for `a_prop, a_req_prop`.
+        self.assertEqual(len(self.statements), 2)
+        self.assertTrue(self.statements[0][1])
+        self.assertEqual(obj1.a_prop, 10)
+        self.assertEqual(obj4.a_req_prop, "bli")
+        self.assertFalse(self.dbsession.dirty)
+
+        self.dbsession.commit()
+        self.dbsession.expire_all()
+        self.assertEqual([o.a_prop for o in self.objects], [10, 20, 3, 40])
+        self.assertEqual(obj4.a_req_prop, "bli")
+
+    def test_update_many_invalid(self):
+        obj1, obj2 = self.objects[:2]
+        with self.assertRaises(voluptuous.MultipleInvalid):
+            mapping.update_many([(obj1, {"a_prop": 10}), (obj2, {"a_prop": "bla"})], a_schema)
+
+        self.assertEqual(self.statements, [])
+        self.assertEqual(obj1.a_prop, 1)
+
+    def test_update_many_without_session(self):
+        an_object = test_worker.FakeMapping()
+        changed = mapping.update_many([(an_object, {"a_prop": 14})], a_schema)
+        self.assertEqual(changed, [an_object])
+        self.assertEqual(an_object.a_prop, 14)
@@ -0,0 +1,13 @@
+from yesaide.async_worker import AsyncRawWorker
+
+
+class AsyncRawForeman(AsyncRawWorker):
+    """Special async worker to manage other async workers.
+
+    Workers can be declared with `yesaide.foreman.LazyWorker`, as for
+    `RawForeman`.
+
+    """
+
+    def __init__(self, dbsession=None):
+        AsyncRawWorker.__init__(self, dbsession)
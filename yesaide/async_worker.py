@@ -0,0 +1,139 @@
+"""Asyncio counterparts of the workers of `yesaide.worker`, working with
+a SQLAlchemy `AsyncSession` (SQLAlchemy >= 1.4).
+
+Queries are built as `select()` statements: `base_query()` returns a
+statement, which is executed (and awaited) by `get()` and
+`get_many()`.
+
+"""
+from sqlalchemy import select
+
+from yesaide import mapping
+from yesaide.worker import MappingManagingWorker
+
+
+class AsyncRawWorker(object):
+    """Deepest async worker, only ensure that a sqlalchemy async
+    database session is available in `self._dbsession`."""
+
+    def __init__(self, dbsession):
+        self._dbsession = dbsession
+
+
+class AsyncSupervisedWorker(AsyncRawWorker):
+    """Async worker intended to be used inside an async foreman."""
+
+    def __init__(self, foreman, foreman_name=None):
+        AsyncRawWorker.__init__(self, foreman._dbsession)
+
+        if not foreman_name:
+            foreman_name = "_foreman"
+
+        setattr(self, foreman_name, foreman)
+
+
+class AsyncMappingManagingWorker(AsyncSupervisedWorker):
+    """Async worker intended to be used inside an async foreman, to take
+    care of a specific SQLAlchemy mapping.
+
+    See `yesaide.worker.MappingManagingWorker`.
+
+    """
+
+    get_many_chunk_size = mapping.DEFAULT_CHUNK_SIZE
+    serializer_fields = None
+    serializer_load_only = False
+    load_profiles = {}
+
+    def __init__(
+        self,
+        foreman=None,
+        foreman_name=None,
+        managed_sqla_map=None,
+        managed_sqla_map_name=None,
+        id_type=None,
+    ):
+        AsyncSupervisedWorker.__init__(self, foreman, foreman_name)
+
+        self._sqla_map = managed_sqla_map
+        self._sqla_map_name = managed_sqla_map_name
+
+        if id_type and id_type not in ("id", "uuid"):
+            raise AttributeError("Wrong `id_type`.")
+        self._with_id = id_type == "id" or hasattr(self._sqla_map, "id")
+        self._with_uuid = id_type == "uuid" or hasattr(self._sqla_map, "uuid")
+
+    # Those don't touch the database and are shared with the
+    # synchronous worker.
+    _id_column = MappingManagingWorker._id_column
+    _get_criteria = MappingManagingWorker._get_criteria
+    _default_options = MappingManagingWorker._default_options
+    _profile_options = MappingManagingWorker._profile_options
+    serialize = MappingManagingWorker.serialize
+
+    async def _get(self, sqla_obj_id=None, sqla_obj=None, options=None, profile=None, **kwargs):
+        """Unified internal get, see `MappingManagingWorker._get()`."""
+        if sqla_obj:
+            if not isinstance(sqla_obj, self._sqla_map):
+                raise ValueError("`sqla_obj` doesn't match with the " "registered type.")
+            return sqla_obj
+
+        elif sqla_obj_id:
+            statement = self.base_query(**kwargs).where(self._id_column() == sqla_obj_id)
+
+            if options is None:
+                options = []
+
+            statement = statement.options(
+                *self._default_options(), *self._profile_options(profile), *options
+            )
+            result = await self._dbsession.execute(statement)
+            return result.unique().scalars().one()
+
+        raise TypeError("No criteria provided.")
+
+    async def get(self, sqla_obj_id=None, sqla_obj=None, options=None, profile=None, **kwargs):
+        """Unified external get, see `MappingManagingWorker.get()`."""
+        sqla_obj_id, sqla_obj = self._get_criteria(sqla_obj_id, sqla_obj, kwargs)
+        return await self._get(sqla_obj_id, sqla_obj, options, profile, **kwargs)
+
+    async def get_many(
+        self, sqla_obj_ids, options=None, missing=mapping.MISSING_RAISE, profile=None, **kwargs
+    ):
+        """Get all the objects whose id (or uuid) is in `sqla_obj_ids`,
+        in the same order, see `MappingManagingWorker.get_many()`.
+
+        """
+        if missing not in (mapping.MISSING_RAISE, mapping.MISSING_SKIP, mapping.MISSING_NONE):
+            raise ValueError("Wrong `missing` policy.")
+
+        sqla_obj_ids = list(sqla_obj_ids)
+        if not sqla_obj_ids:
+            return []
+
+        id_column = self._id_column()
+        normalize = mapping.id_normalizer(id_column)
+
+        distinct_ids = list({normalize(i): None for i in sqla_obj_ids if i is not None})
+
+        statement = self.base_query(**kwargs).options(
+            *self._default_options(), *self._profile_options(profile)
+        )
+        if options:
+            statement = statement.options(*options)
+
+        found = {}
+        for chunk in mapping.iter_chunks(distinct_ids, self.get_many_chunk_size):
+            result = await self._dbsession.execute(statement.where(id_column.in_(chunk)))
+            for sqla_obj in result.unique().scalars():
+                found[getattr(sqla_obj, id_column.key)] = sqla_obj
+
+        return mapping.order_by_ids(sqla_obj_ids, found, normalize=normalize, missing=missing)
+
+    def base_query(self, **kwargs):
+        """Base sqlalchemy statement for this kind of object.
+
+        Subclasses can override this method to implement custom logic
+        (filtering inactive objects, security features, etc).
+        """
+        return select(self._sqla_map)
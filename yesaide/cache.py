@@ -0,0 +1,146 @@
+"""Cache backends and helpers for the worker read-through cache (see
+`MappingManagingWorker.cache_backend`).
+
+A backend is any object with `get(key)` (returning None when the key
+is unknown), `set(key, value)`, `delete(key)` and `clear()` methods.
+Keys are tuples of strings, ints, uuids... Values are dicts of column
+values, never SQLAlchemy objects, so they can be shared between
+sessions (and processes).
+
+"""
+import collections
+import pickle
+import threading
+import time
+
+from sqlalchemy import inspect as sqla_inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+class LRUCache(object):
+    """In-process, thread-safe, LRU cache.
+
+    Arguments:
+        maxsize -- maximum number of entries
+        ttl -- time to live of an entry, in seconds (None for no
+               expiration)
+        clock -- function returning the current time, in seconds
+
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires_at, value = self._entries[key]
+            except KeyError:
+                return default
+
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DictCache(object):
+    """Dict-backed stand-in for a shared cache (memcached, redis...).
+
+    Keys and values are pickled, as they would be to be sent to a
+    shared cache, so that anything which works with this backend can be
+    shared between processes.
+
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else {}
+
+    def get(self, key, default=None):
+        try:
+            return pickle.loads(self.store[pickle.dumps(key)])
+        except KeyError:
+            return default
+
+    def set(self, key, value):
+        self.store[pickle.dumps(key)] = pickle.dumps(value)
+
+    def delete(self, key):
+        self.store.pop(pickle.dumps(key), None)
+
+    def clear(self):
+        self.store.clear()
+
+
+def dump_state(sqla_obj):
+    """Return a dict of the loaded column values of `sqla_obj`, or None
+    if its primary key is not loaded.
+
+    """
+    state = sqla_inspect(sqla_obj)
+    mapper = state.mapper
+
+    values = {}
+    for prop in mapper.column_attrs:
+        if prop.key in state.dict:
+            values[prop.key] = state.dict[prop.key]
+
+    for column in mapper.primary_key:
+        if mapper.get_property_by_column(column).key not in values:
+            return None
+
+    return values
+
+
+def load_state(dbsession, sqla_map, values):
+    """Return the persistent object of type `sqla_map` described by
+    `values` (as returned by `dump_state()`) in `dbsession`, without
+    issuing any query.
+
+    If the object is already in the session identity map, it is
+    returned untouched.
+
+    """
+    mapper = sqla_inspect(sqla_map)
+    pk = tuple(values[mapper.get_property_by_column(c).key] for c in mapper.primary_key)
+
+    sqla_obj = dbsession.identity_map.get(mapper.identity_key_from_primary_key(pk))
+    if sqla_obj is not None:
+        return sqla_obj
+
+    sqla_obj = mapper.class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(sqla_obj, key, value)
+
+    make_transient_to_detached(sqla_obj)
+    dbsession.add(sqla_obj)
+    return sqla_obj
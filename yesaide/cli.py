@@ -1,4 +1,15 @@
+import argparse
+import collections
+import concurrent.futures
+import csv
+import importlib
+import json
 import re
+import sys
+
+from voluptuous import Schema
+
+from yesaide import validation
 
 
 def set_filename_version(filename, version_number, pattern):
@@ -75,3 +86,250 @@ def flags_to_release(is_minor=False, is_major=False):
     if is_major:
         return "major"
     return "normal"
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def load_schema(reference):
+    """Return the schema referenced by `reference`, a "module:attr"
+    string, e.g. "myapp.schemas:user_import" (`attr` may be dotted).
+
+    """
+    module_name, _, attr = reference.partition(":")
+    if not module_name or not attr:
+        raise ValueError('Expected a "module:attr" schema reference, got "{}".'.format(reference))
+
+    schema = importlib.import_module(module_name)
+    for name in attr.split("."):
+        schema = getattr(schema, name)
+    return schema
+
+
+def read_chunks(stream, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of at most `chunk_size` records read from `stream`.
+
+    NDJSON records are the raw (non blank) lines, which are decoded by
+    `check_chunk()`, so that decoding runs in the worker processes too.
+    CSV records are dicts of strings, keyed by the header row.
+
+    """
+    if file_format == "csv":
+        records = csv.DictReader(stream)
+    else:
+        records = (line for line in stream if line.strip())
+
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _error_path(error):
+    # Paths may hold voluptuous markers, e.g. `Required("id")`.
+    return [key if isinstance(key, (str, int)) else str(key) for key in error.path]
+
+
+def check_chunk(schema, file_format, chunk):
+    """Validate the records of `chunk` with `validation.validate_many()`
+    and return `(index, errors)` tuples for the invalid ones: the index
+    of the record in the chunk, and a list of `{"path": ..., "message":
+    ...}` dicts (which, unlike voluptuous errors, can be sent back by a
+    worker process). Unexpected exceptions of the validators are
+    reported as errors of their record too.
+
+    """
+    if file_format == "csv":
+        rows = chunk
+        errors = []
+    else:
+        rows = []
+        errors = []
+        indexes = []
+        for i, line in enumerate(chunk):
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                errors.append((i, [{"path": [], "message": "Invalid JSON: {}".format(exc)}]))
+                continue
+
+            if not isinstance(row, dict):
+                errors.append((i, [{"path": [], "message": "Expected a JSON object."}]))
+                continue
+
+            rows.append(row)
+            indexes.append(i)
+
+    result = validation.validate_many(schema, rows)
+    for i, exc in result.errors:
+        if file_format != "csv":
+            i = indexes[i]
+        errors.append(
+            (i, [{"path": _error_path(error), "message": error.msg} for error in exc.errors])
+        )
+
+    errors.sort(key=lambda error: error[0])
+    return errors
+
+
+def _load_dict_schema(schema_reference):
+    # Plain dicts are wrapped once, so that they are compiled once (see
+    # `validation.validate_many()`).
+    schema = load_schema(schema_reference)
+    if isinstance(schema, dict):
+        schema = Schema(schema)
+    return schema
+
+
+# Schema of the worker processes of `validate_stream()`, see
+# `_init_worker()`.
+_worker_schema = None
+
+
+def _init_worker(schema_reference):
+    global _worker_schema
+    _worker_schema = _load_dict_schema(schema_reference)
+
+
+def _check_chunk_in_worker(file_format, chunk):
+    return check_chunk(_worker_schema, file_format, chunk)
+
+
+def validate_stream(
+    schema_reference,
+    stream,
+    file_format,
+    jobs=1,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    counter=None,
+):
+    """Validate the NDJSON or CSV records of `stream` with the schema
+    referenced by `schema_reference` (see `load_schema()`), and yield
+    `(record_number, errors)` tuples (see `check_chunk()`) for the
+    invalid records, in the order of the file. Record numbers start at
+    1 and don't count blank lines or the CSV header.
+
+    With more than one job, chunks of `chunk_size` records are validated
+    by a pool of `jobs` processes, each one loading the schema itself.
+    At most `2 * jobs` chunks are read ahead, so that memory doesn't
+    grow with the size of the file.
+
+    `counter`, a `collections.Counter`, gets the number of validated
+    records under "records".
+
+    """
+    if counter is None:
+        counter = collections.Counter()
+    chunks = read_chunks(stream, file_format, chunk_size)
+
+    if jobs <= 1:
+        schema = _load_dict_schema(schema_reference)
+        for chunk in chunks:
+            start = counter["records"] + 1
+            counter["records"] += len(chunk)
+            for i, errors in check_chunk(schema, file_format, chunk):
+                yield start + i, errors
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        jobs, initializer=_init_worker, initargs=(schema_reference,)
+    ) as executor:
+        pending = collections.deque()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * jobs:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                start = counter["records"] + 1
+                counter["records"] += len(chunk)
+                pending.append((start, executor.submit(_check_chunk_in_worker, file_format, chunk)))
+
+            if pending:
+                start, future = pending.popleft()
+                for i, errors in future.result():
+                    yield start + i, errors
+
+
+def _guess_format(filename):
+    return "csv" if filename.lower().endswith(".csv") else "ndjson"
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog="yesaide")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    validate = subparsers.add_parser(
+        "validate",
+        help="validate the records of a NDJSON or CSV file",
+        description="Validate the records of a NDJSON or CSV file, and write one JSON line "
+        "for each invalid record, in the order of the file.",
+    )
+    validate.add_argument("schema", help='schema reference, e.g. "myapp.schemas:user_import"')
+    validate.add_argument("file", help='file to validate, "-" for the standard input')
+    validate.add_argument(
+        "--format",
+        choices=("ndjson", "csv"),
+        help="format of the file (default: guessed from its extension, NDJSON otherwise)",
+    )
+    validate.add_argument(
+        "-j", "--jobs", type=int, default=1, help="number of worker processes (default: 1)"
+    )
+    validate.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="number of records per chunk (default: {})".format(DEFAULT_CHUNK_SIZE),
+    )
+
+    return parser
+
+
+def _validate_command(args, stdout, stderr):
+    try:
+        load_schema(args.schema)
+    except (ValueError, ImportError, AttributeError) as exc:
+        stderr.write("Can't load the schema: {}\n".format(exc))
+        return 2
+
+    file_format = args.format or _guess_format(args.file)
+    counter = collections.Counter()
+    invalid = 0
+
+    if args.file == "-":
+        stream = sys.stdin
+    else:
+        stream = open(args.file, newline="" if file_format == "csv" else None)
+
+    try:
+        for record_number, errors in validate_stream(
+            args.schema, stream, file_format, args.jobs, args.chunk_size, counter
+        ):
+            invalid += 1
+            stdout.write(json.dumps({"record": record_number, "errors": errors}, default=str))
+            stdout.write("\n")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    stderr.write("{} records, {} invalid.\n".format(counter["records"], invalid))
+    return 1 if invalid else 0
+
+
+def main(argv=None, stdout=None, stderr=None):
+    """Entry point of the `yesaide` command."""
+    args = _build_parser().parse_args(argv)
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+
+    if args.jobs < 1 or args.chunk_size < 1:
+        stderr.write("--jobs and --chunk-size must be positive.\n")
+        return 2
+
+    return _validate_command(args, stdout, stderr)
@@ -1,7 +1,17 @@
+import contextlib
+import functools
+import os
+import random
+import threading
+import time
 import uuid
 
+from sqlalchemy import inspect as sqla_inspect, text
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.types import TypeDecorator, CHAR
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.types import TypeDecorator, BINARY, CHAR
+
+from yesaide import YesaideRuntimeError
 
 
 class MetaBase(object):
@@ -15,48 +25,431 @@ class MetaBase(object):
     """
 
 
-def db_method(func):
+class Transaction(object):
+    """State of a transaction opened by `transaction()`, stored on the
+    database session as `_ya_in_transaction`.
+
+    Attributes:
+        depth -- current nesting level (1 for the outermost scope)
+        saved_commits -- number of commits skipped by `db_method`s
+                         because of the transaction
+
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.saved_commits = 0
+        self._after_commit = []
+        self._after_rollback = []
+
+    def defer_commit(self, callback=None):
+        """Register a commit skipped by a `db_method`, and the function
+        to call once the transaction is committed (if any).
+
+        """
+        self.saved_commits += 1
+        if callback is not None and callback not in self._after_commit:
+            self._after_commit.append(callback)
+
+    def on_rollback(self, callback):
+        """Register a function to call if the transaction is rolled
+        back.
+
+        """
+        if callback not in self._after_rollback:
+            self._after_rollback.append(callback)
+
+    def _rolled_back(self):
+        for callback in self._after_rollback:
+            callback()
+
+
+@contextlib.contextmanager
+def transaction(dbsession):
+    """Context manager making every `db_method` called inside it skip
+    its commit, to commit exactly once when the outermost scope exits.
+
+    Nested scopes use SAVEPOINTs: an exception raised inside a nested
+    scope only rolls back what happened in that scope. An exception
+    leaving the outermost scope rolls the whole transaction back.
+
+    Yield the `Transaction` state (see `Transaction.saved_commits`).
+
+    Example usage:
+
+        with worker.transaction() as tx:
+            worker.create(...)
+            worker.update(...)
+
+    """
+    scope = getattr(dbsession, "_ya_in_transaction", False)
+
+    if scope:
+        if not isinstance(scope, Transaction):
+            # Flag set by some external code, which will commit.
+            scope = Transaction()
+
+        savepoint = dbsession.begin_nested()
+        scope.depth += 1
+        try:
+            yield scope
+        except BaseException:
+            savepoint.rollback()
+            raise
+        else:
+            savepoint.commit()
+        finally:
+            scope.depth -= 1
+        return
+
+    scope = Transaction()
+    scope.depth = 1
+    dbsession._ya_in_transaction = scope
+    try:
+        yield scope
+    except BaseException:
+        dbsession._ya_in_transaction = False
+        dbsession.rollback()
+        scope._rolled_back()
+        raise
+
+    dbsession._ya_in_transaction = False
+    try:
+        dbsession.commit()
+    except BaseException:
+        dbsession.rollback()
+        scope._rolled_back()
+        raise
+
+    for callback in scope._after_commit:
+        callback()
+
+
+def _pop_commit_flush(worker, kwargs):
+    """Pop and check the `commit` and `flush` arguments of a database
+    method of `worker`.
+
+    """
+    # Determine if we'll issue a commit or not. Remove 'commit'
+    # from kwargs anyway.
+    commit = kwargs.pop("commit", True)
+    flush = kwargs.pop("flush", False)
+
+    if flush is True and commit is True:
+        raise Exception(
+            "Passing both `flush=True` AND `commit=True` might not be what you want to do "
+            "- if you just want to flush instead of committing, explicitely pass `commit=False`; "
+            "if you want to commit, no need to flush, you can remove `flush=True`"
+        )
+
+    scope = getattr(worker._dbsession, "_ya_in_transaction", False)
+    if scope:
+        if commit and isinstance(scope, Transaction):
+            invalidate_cache = getattr(worker, "invalidate_cache", None)
+            scope.defer_commit(invalidate_cache)
+            if invalidate_cache is not None:
+                scope.on_rollback(invalidate_cache)
+        commit = False
+
+    return commit, flush
+
+
+def is_writing(dbsession):
+    """Tell if `dbsession` is being used by a `db_method` or inside a
+    `transaction()` scope, in which case reads must not be routed to a
+    read replica.
+
+    """
+    return bool(
+        getattr(dbsession, "_ya_db_method_depth", 0)
+        or getattr(dbsession, "_ya_in_transaction", False)
+    )
+
+
+def check_read_dbsession(worker):
+    """Raise `YesaideRuntimeError` if objects of the read replica
+    session of `worker` (see `yesaide.worker.RawWorker.read_dbsession()`)
+    have been modified: committing the primary session would silently
+    drop these changes, which are rolled back instead. Objects which are
+    going to be modified must be read with `use_primary=True`.
+
+    """
+    opened_read_dbsession = getattr(worker, "opened_read_dbsession", None)
+    if opened_read_dbsession is None:
+        return
+
+    read_dbsession = opened_read_dbsession()
+    if read_dbsession is None or read_dbsession is worker._dbsession:
+        return
+
+    if read_dbsession.new or read_dbsession.dirty or read_dbsession.deleted:
+        read_dbsession.rollback()
+        raise YesaideRuntimeError(
+            "Objects of the read replica session were modified, read them with "
+            "`use_primary=True` to change them."
+        )
+
+
+class RetryPolicy(object):
+    """Retry policy of a `db_method`, for transient errors such as
+    serialization failures and deadlocks.
+
+    Keyword arguments:
+        max_attempts -- maximum number of attempts, first one included
+        base_delay -- delay before the first retry, in seconds, doubled
+                      on each subsequent retry
+        max_delay -- maximum delay between two attempts, in seconds
+        jitter -- wait a random delay between 0 and the computed one
+                  ("full jitter"), to spread concurrent retries
+        sqlstates -- SQLSTATE codes to retry (by default serialization
+                     failures and deadlocks)
+        error_codes -- driver error codes to retry, for drivers which
+                       don't expose SQLSTATEs (by default MySQL
+                       deadlocks)
+        retry_on -- additional exception classes to retry
+        sleep -- function used to wait
+
+    `retries` counts the retries made with this policy, in total and
+    per method (`retries_per_method`).
+
+    """
+
+    def __init__(
+        self,
+        max_attempts=3,
+        base_delay=0.05,
+        max_delay=2.0,
+        jitter=True,
+        sqlstates=("40001", "40P01"),
+        error_codes=(1213,),
+        retry_on=(),
+        sleep=time.sleep,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.sqlstates = sqlstates
+        self.error_codes = error_codes
+        self.retry_on = tuple(retry_on)
+        self.sleep = sleep
+
+        self.retries = 0
+        self.retries_per_method = {}
+
+    def is_retryable(self, exc):
+        if self.retry_on and isinstance(exc, self.retry_on):
+            return True
+
+        if not isinstance(exc, DBAPIError):
+            return False
+
+        orig = exc.orig
+        sqlstate = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+        if sqlstate in self.sqlstates:
+            return True
+
+        args = getattr(orig, "args", ())
+        return bool(args) and args[0] in self.error_codes
+
+    def delay(self, attempt):
+        """Return the delay to wait after the given (failed) attempt."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    def record_retry(self, method_name):
+        self.retries += 1
+        self.retries_per_method[method_name] = self.retries_per_method.get(method_name, 0) + 1
+
+
+# Timing hook of every `db_method` without its own, see
+# `set_timing_hook()`.
+_timing_hook = None
+
+
+def set_timing_hook(hook):
+    """Set the function called with the duration of the phases of
+    every `db_method` call (the ones declared with their own
+    `timing_hook` excepted), and return the previous one.
+
+    The hook is called after each successful call as
+    `hook(method_name, body, flush, commit)`, with durations in seconds
+    (None for the phases which didn't run: `flush` is timed whenever
+    the method flushes or commits, as the commit flushes first).
+
+    Pass None to disable timing, which is the default.
+    `yesaide.instrumentation.PhaseHistograms` aggregates these timings.
+
+    """
+    global _timing_hook
+    previous, _timing_hook = _timing_hook, hook
+    return previous
+
+
+def _timed_call(hook, func, worker, args, kwargs, flush, commit):
+    """Run a `db_method` body and its flush / commit, and give their
+    durations to `hook`.
+
+    """
+    dbsession = worker._dbsession
+    flush_time = commit_time = None
+
+    start = time.perf_counter()
+    retval = func(worker, *args, **kwargs)
+    body_end = time.perf_counter()
+    check_read_dbsession(worker)
+
+    if flush or commit:
+        dbsession.flush()
+        flush_end = time.perf_counter()
+        flush_time = flush_end - body_end
+
+        if commit:
+            dbsession.commit()
+            commit_time = time.perf_counter() - flush_end
+
+    hook(func.__qualname__, body_end - start, flush_time, commit_time)
+    return retval
+
+
+def db_method(func=None, retry=None, timing_hook=None):
     """Decorator for a database method of a `DataRepository` object.
 
     The decorated method's object must have its database session
     stored in self._dbsession`.
 
+    Can be given a `RetryPolicy`, in which case the method (and its
+    commit) is run again after a rollback when a retryable error is
+    raised:
+
+        @db_method(retry=RetryPolicy(max_attempts=5))
+        def transfer(self, ...):
+            ...
+
+    Methods are only retried when they own their commit, i.e. never
+    when called with `commit=False` or inside a `transaction()` scope
+    (the rollback would discard work done outside of the method).
+
+    Can also be given its own `timing_hook`, used instead of the one
+    set by `set_timing_hook()`.
+
     """
+    if func is None:
+        return functools.partial(db_method, retry=retry, timing_hook=timing_hook)
 
     def wrapped_commit_func(self, *args, **kwargs):
-        # Determine if we'll issue a commit or not. Remove 'commit'
-        # from kwargs anyway.
-        commit = kwargs.pop("commit", True)
-        flush = kwargs.pop("flush", False)
-
-        if flush is True and commit is True:
-            raise Exception(
-                "Passing both `flush=True` AND `commit=True` might not be what you want to do "
-                "- if you just want to flush instead of committing, explicitely pass `commit=False`; "
-                "if you want to commit, no need to flush, you can remove `flush=True`"
-            )
+        commit, flush = _pop_commit_flush(self, kwargs)
+
+        dbsession = self._dbsession
+        # Tells read replica routing (see `is_writing()`) to stay on
+        # this session.
+        dbsession._ya_db_method_depth = getattr(dbsession, "_ya_db_method_depth", 0) + 1
+        try:
+            attempt = 1
+            while True:
+                try:
+                    hook = _timing_hook if timing_hook is None else timing_hook
+                    if hook is not None:
+                        retval = _timed_call(hook, func, self, args, kwargs, flush, commit)
+                        break
+
+                    retval = func(self, *args, **kwargs)
+                    check_read_dbsession(self)
+
+                    if flush:
+                        self._dbsession.flush()
+
+                    if commit:
+                        self._dbsession.commit()
 
-        if getattr(self._dbsession, "_ya_in_transaction", False):
-            commit = False
+                    break
 
-        retval = func(self, *args, **kwargs)
+                except Exception as exc:
+                    # Nested calls don't own the transaction: rolling
+                    # it back would drop the work of the outer calls.
+                    if (
+                        retry is None
+                        or not commit
+                        or dbsession._ya_db_method_depth != 1
+                        or attempt >= retry.max_attempts
+                        or not retry.is_retryable(exc)
+                    ):
+                        raise
+
+                    self._dbsession.rollback()
+                    retry.record_retry(func.__qualname__)
+                    retry.sleep(retry.delay(attempt))
+                    attempt += 1
+
+            if commit:
+                invalidate_cache = getattr(self, "invalidate_cache", None)
+                if invalidate_cache is not None:
+                    invalidate_cache()
+
+            return retval
+        finally:
+            dbsession._ya_db_method_depth -= 1
+
+    return wrapped_commit_func
+
+
+def async_db_method(func):
+    """Same as `db_method`, for a coroutine method of an object whose
+    database session (stored in `self._dbsession`) is an
+    `AsyncSession`.
+
+    """
+
+    async def wrapped_commit_func(self, *args, **kwargs):
+        commit, flush = _pop_commit_flush(self, kwargs)
+
+        retval = await func(self, *args, **kwargs)
 
         if flush:
-            self._dbsession.flush()
+            await self._dbsession.flush()
 
         if commit:
-            self._dbsession.commit()
+            await self._dbsession.commit()
 
         return retval
 
     return wrapped_commit_func
 
 
+def _to_uuid(value):
+    if value.__class__ is uuid.UUID:
+        return value
+    return uuid.UUID(value)
+
+
+def _chain_processors(first, second):
+    """Return a processor applying `first` then `second` (each of them
+    being possibly None).
+
+    """
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return lambda value: second(first(value))
+
+
 class GUIDType(TypeDecorator):
     """Platform-independent GUID type.
 
     Uses Postgresql's UUID type, otherwise uses CHAR(32), storing as
-    stringified hex values.
+    stringified hex values, or BINARY(16) if `binary` is true, storing
+    the 16 bytes of the UUID (half the key width, see
+    `migrate_guid_column_to_binary()` to convert existing columns).
+
+    If `raw` is true, values are returned as 32 characters hex strings
+    instead of `uuid.UUID` objects, which is cheaper on large result
+    sets.
+
+    Bind and result processors are built once per dialect, see
+    `bind_processor()` and `result_processor()`.
 
     Inspired from: http://docs.sqlalchemy.org/en/rel_0_8/core/types.html
 
@@ -65,24 +458,240 @@ class GUIDType(TypeDecorator):
     impl = CHAR
     cache_ok = True
 
+    def __init__(self, binary=False, raw=False):
+        TypeDecorator.__init__(self)
+        self.binary = binary
+        self.raw = raw
+
     def load_dialect_impl(self, dialect):
         if dialect.name == "postgresql":
             return dialect.type_descriptor(UUID())
+        elif self.binary:
+            return dialect.type_descriptor(BINARY(16))
         else:
             return dialect.type_descriptor(CHAR(32))
 
     def process_bind_param(self, value, dialect):
-        if value is None:
+        return self.bind_processor_for(dialect.name)(value)
+
+    def process_result_value(self, value, dialect):
+        process = self.result_processor_for(dialect.name)
+        if process is None:
             return value
-        elif dialect.name == "postgresql":
-            return str(value)
+        return process(value)
+
+    def bind_processor_for(self, dialect_name):
+        """Return the function converting a bound value (`uuid.UUID`
+        or string) for the given dialect, without branching per value.
+
+        """
+        if dialect_name == "postgresql":
+
+            def process(value):
+                if value is None:
+                    return None
+                return str(value)
+
+        elif self.binary:
+
+            def process(value):
+                if value is None:
+                    return None
+                return _to_uuid(value).bytes
+
         else:
-            if not isinstance(value, uuid.UUID):
-                return "%.32x" % uuid.UUID(value).int
+
+            def process(value):
+                if value is None:
+                    return None
+                return _to_uuid(value).hex
+
+        return process
+
+    def result_processor_for(self, dialect_name):
+        """Return the function converting a value read from the
+        database for the given dialect, without branching per value.
+
+        """
+        if dialect_name == "postgresql":
+            if self.raw:
+
+                def process(value):
+                    if value is None:
+                        return None
+                    if value.__class__ is str:
+                        return value.replace("-", "")
+                    return value.hex
+
             else:
-                return "%.32x" % value.int
 
-    def process_result_value(self, value, dialect):
-        if value is not None:
-            return uuid.UUID(value)
-        return None
+                def process(value):
+                    if value is None:
+                        return None
+                    return _to_uuid(value)
+
+        elif self.binary:
+            if self.raw:
+
+                def process(value):
+                    if value is None:
+                        return None
+                    return bytes(value).hex()
+
+            else:
+
+                def process(value):
+                    if value is None:
+                        return None
+                    return uuid.UUID(bytes=bytes(value))
+
+        else:
+            if self.raw:
+                # Already stored as hex strings.
+                process = None
+
+            else:
+
+                def process(value):
+                    if value is None:
+                        return None
+                    return uuid.UUID(value)
+
+        return process
+
+    def bind_processor(self, dialect):
+        return _chain_processors(
+            self.bind_processor_for(dialect.name), self.impl.bind_processor(dialect)
+        )
+
+    def result_processor(self, dialect, coltype):
+        return _chain_processors(
+            self.impl.result_processor(dialect, coltype), self.result_processor_for(dialect.name)
+        )
+
+
+class _UUID7Generator(object):
+    """Generate time-ordered UUIDs (version 7, RFC 9562).
+
+    The 48 high bits are the Unix timestamp in milliseconds, the 12
+    bits following the version are a counter (seeded randomly each
+    millisecond) keeping the UUIDs generated by a process strictly
+    increasing, and the remaining 62 bits are random.
+
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+
+    def __call__(self):
+        random_bytes = os.urandom(10)
+
+        with self._lock:
+            now_ms = time.time_ns() // 1000000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                # Leave room for at least 2048 increments.
+                self._counter = int.from_bytes(random_bytes[:2], "big") & 0x7FF
+            else:
+                # Same millisecond, or the clock went backwards.
+                self._counter += 1
+                if self._counter > 0xFFF:
+                    self._last_ms += 1
+                    self._counter = 0
+            timestamp, counter = self._last_ms, self._counter
+
+        return uuid.UUID(
+            int=(timestamp & 0xFFFFFFFFFFFF) << 80
+            | 0x7 << 76
+            | counter << 64
+            | 0x2 << 62
+            | int.from_bytes(random_bytes[2:], "big") & 0x3FFFFFFFFFFFFFFF
+        )
+
+
+_uuid7_generator = _UUID7Generator()
+
+# The lock may be held by another thread at fork time (POSIX only).
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_uuid7_generator._reset)
+
+
+def uuid7():
+    """Return a new time-ordered `uuid.UUID` (version 7).
+
+    Unlike `uuid.uuid4()`, consecutive values are close to each other in
+    indexes, so inserts append to the end of the primary key B-tree
+    instead of splitting random pages. Can be used as a column default:
+
+        uuid = Column(GUIDType, primary_key=True, default=uuid7)
+
+    UUIDs are strictly increasing within a process (thread safe).
+    Processes (including forked ones) only share the millisecond
+    timestamp, the random bits keep their UUIDs unique.
+
+    """
+    return _uuid7_generator()
+
+
+def migrate_guid_column_to_binary(connection, table_name, column_name, batch_size=1000):
+    """Convert an existing CHAR(32) `GUIDType` column to the binary
+    storage mode (`GUIDType(binary=True)`).
+
+    On MySQL, the column is converted in place with `ALTER TABLE`
+    statements, keeping its indexes. Foreign keys referencing the
+    column must be converted along with it, with foreign key checks
+    disabled.
+
+    On SQLite, which doesn't enforce column types, values are converted
+    in place by batches of `batch_size` rows (the declared column type
+    is left untouched).
+
+    Not needed on Postgresql, where UUIDs are stored natively.
+
+    """
+    dialect = connection.dialect
+    table = dialect.identifier_preparer.quote(table_name)
+    column = dialect.identifier_preparer.quote(column_name)
+
+    if dialect.name == "mysql":
+        nullable = [
+            c for c in sqla_inspect(connection).get_columns(table_name) if c["name"] == column_name
+        ][0]["nullable"]
+        null = "" if nullable else " NOT NULL"
+
+        connection.execute(
+            text("ALTER TABLE {} MODIFY {} VARBINARY(32){}".format(table, column, null))
+        )
+        connection.execute(text("UPDATE {0} SET {1} = UNHEX({1})".format(table, column)))
+        connection.execute(
+            text("ALTER TABLE {} MODIFY {} BINARY(16){}".format(table, column, null))
+        )
+
+    elif dialect.name == "sqlite":
+        select_statement = text(
+            "SELECT {0} FROM {1} WHERE typeof({0}) = 'text' LIMIT :limit".format(column, table)
+        )
+        update_statement = text("UPDATE {0} SET {1} = :new WHERE {1} = :old".format(table, column))
+
+        while True:
+            hex_values = [
+                row[0] for row in connection.execute(select_statement, {"limit": batch_size})
+            ]
+            if not hex_values:
+                break
+
+            connection.execute(
+                update_statement,
+                [{"old": value, "new": uuid.UUID(value).bytes} for value in hex_values],
+            )
+
+    elif dialect.name == "postgresql":
+        raise YesaideRuntimeError("UUIDs are stored natively on Postgresql.")
+
+    else:
+        raise YesaideRuntimeError("Unsupported dialect: {}.".format(dialect.name))
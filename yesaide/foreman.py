@@ -2,7 +2,59 @@ from yesaide.worker import RawWorker
 
 
 class RawForeman(RawWorker):
-    """Special worker to manage other workers."""
+    """Special worker to manage other workers.
 
-    def __init__(self, dbsession=None):
-        RawWorker.__init__(self, dbsession)
+    Pure reads of the managed workers go to `read_dbsession` (a session
+    or a session factory, e.g. a `sessionmaker` bound to a read
+    replica) when given, see
+    `MappingManagingWorker._reading_dbsession()`.
+
+    """
+
+    def __init__(self, dbsession=None, read_dbsession=None):
+        RawWorker.__init__(self, dbsession, read_dbsession)
+
+
+class LazyWorker(object):
+    """Declare a worker at the class level of a foreman. The worker is
+    built on first access and then cached on the foreman instance, so
+    that building a foreman doesn't build workers it won't use.
+
+    Example usage:
+
+        class Foreman(RawForeman):
+            users = LazyWorker(UserWorker)
+            countries = LazyWorker(
+                MappingManagingWorker,
+                managed_sqla_map=Country,
+                managed_sqla_map_name="country",
+            )
+
+    Arguments (other than `worker_cls`) are given to the worker
+    constructor, after the foreman.
+
+    """
+
+    def __init__(self, worker_cls, *args, **kwargs):
+        self.worker_cls = worker_cls
+        self.args = args
+        self.kwargs = kwargs
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, foreman, owner=None):
+        if foreman is None:
+            return self
+
+        a_worker = self.worker_cls(foreman, *self.args, **self.kwargs)
+
+        instrumentation = getattr(foreman, "_ya_instrumentation", None)
+        if instrumentation is not None:
+            instrumentation.attach(a_worker)
+
+        # As `LazyWorker` is a non-data descriptor, the instance
+        # attribute takes precedence on next accesses.
+        foreman.__dict__[self.name] = a_worker
+        return a_worker
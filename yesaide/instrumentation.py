@@ -0,0 +1,303 @@
+"""Per worker method SQL instrumentation, mostly to catch N+1 queries
+hidden in `serialize()` implementations.
+
+Example usage:
+
+    instrument_engine(engine)  # Once, at startup.
+
+    # Per request:
+    instrumentation = QueryInstrumentation(threshold=10)
+    instrumentation.attach(foreman)
+    ...
+    log(instrumentation.report())
+
+Statements are attributed to every instrumented method call in
+progress (in the current thread or asyncio task) when they are
+executed, so counts are inclusive: a `serialize()` calling another
+worker `get()` is charged for the statements of that `get()` too.
+
+Async foremen and workers (see `yesaide.async_foreman`) are
+instrumented the same way, their engine being an `AsyncEngine`.
+
+Also provides `PhaseHistograms`, aggregating the durations of the
+phases (body, flush, commit) of `db_method` calls:
+
+    histograms = PhaseHistograms()
+    database.set_timing_hook(histograms)
+    ...
+    metrics_endpoint_body = histograms.prometheus_text()
+
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+
+from sqlalchemy import event
+
+from yesaide.async_foreman import AsyncRawForeman
+from yesaide.async_worker import AsyncRawWorker
+from yesaide.foreman import RawForeman
+from yesaide.worker import RawWorker
+
+
+DEFAULT_METHODS = ("get", "get_many", "serialize")
+
+# Upper bounds (in seconds) of the `PhaseHistograms` buckets.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DB_METHOD_PHASES = ("body", "flush", "commit")
+
+# Stack of the instrumented calls in progress.
+_frames = contextvars.ContextVar("yesaide_instrumentation_frames", default=())
+
+
+class _Frame(object):
+    __slots__ = ("statements", "db_time")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_ya_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["_ya_query_start"].pop()
+
+    for frame in _frames.get():
+        frame.statements += 1
+        frame.db_time += elapsed
+
+
+def instrument_engine(engine):
+    """Register the event listeners needed by `QueryInstrumentation`
+    on `engine`, an `Engine` or an `AsyncEngine` (does nothing if they
+    are already registered).
+
+    """
+    engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def uninstrument_engine(engine):
+    engine = getattr(engine, "sync_engine", engine)
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryInstrumentation(object):
+    """Count the SQL statements and the database time of the methods
+    of the attached workers, and flag the calls issuing more than
+    `threshold` statements.
+
+    Arguments:
+        threshold -- maximum number of statements for one call (None to
+                     disable flagging)
+        methods -- names of the instrumented worker methods
+        on_threshold -- function called with `(method_name, statements)`
+                        when a call exceeds the threshold
+
+    """
+
+    def __init__(self, threshold=None, methods=DEFAULT_METHODS, on_threshold=None):
+        self.threshold = threshold
+        self.methods = methods
+        self.on_threshold = on_threshold
+        self.reset()
+
+    def reset(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.methods_stats = {}
+        self.flagged = []
+
+    def attach(self, obj):
+        """Instrument a worker, or a foreman and all its workers
+        (including the ones built later by `LazyWorker`), either
+        synchronous or async.
+
+        """
+        if not isinstance(obj, (RawForeman, AsyncRawForeman)):
+            self._attach_worker(obj)
+            return
+
+        obj._ya_instrumentation = self
+        for value in list(vars(obj).values()):
+            if isinstance(value, (RawWorker, AsyncRawWorker)) and value is not obj:
+                self._attach_worker(value)
+
+    def _attach_worker(self, a_worker):
+        for method_name in self.methods:
+            method = getattr(a_worker, method_name, None)
+            if method is None or getattr(method, "_ya_instrumented", False):
+                continue
+
+            name = "{}.{}".format(type(a_worker).__name__, method_name)
+            setattr(a_worker, method_name, self._wrap(name, method))
+
+    def _wrap(self, name, method):
+        if inspect.iscoroutinefunction(method):
+            # The frame must stay in place until the coroutine is done,
+            # not only until it is created.
+            @functools.wraps(method)
+            async def wrapped_coroutine(*args, **kwargs):
+                frame = _Frame()
+                frames = _frames.get()
+                token = _frames.set(frames + (frame,))
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    _frames.reset(token)
+                    self._record(name, frame, outermost=not frames)
+
+            wrapped_coroutine._ya_instrumented = True
+            return wrapped_coroutine
+
+        @functools.wraps(method)
+        def wrapped(*args, **kwargs):
+            frame = _Frame()
+            frames = _frames.get()
+            token = _frames.set(frames + (frame,))
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _frames.reset(token)
+                self._record(name, frame, outermost=not frames)
+
+        wrapped._ya_instrumented = True
+        return wrapped
+
+    def _record(self, name, frame, outermost):
+        stats = self.methods_stats.get(name)
+        if stats is None:
+            stats = self.methods_stats[name] = {"calls": 0, "statements": 0, "db_time": 0.0}
+
+        stats["calls"] += 1
+        stats["statements"] += frame.statements
+        stats["db_time"] += frame.db_time
+
+        if outermost:
+            self.statements += frame.statements
+            self.db_time += frame.db_time
+
+        if self.threshold is not None and frame.statements > self.threshold:
+            self.flagged.append({"method": name, "statements": frame.statements})
+            if self.on_threshold is not None:
+                self.on_threshold(name, frame.statements)
+
+    def report(self):
+        """Return the totals as a dict, ready to be logged."""
+        return {
+            "statements": self.statements,
+            "db_time": self.db_time,
+            "methods": {name: dict(stats) for name, stats in self.methods_stats.items()},
+            "flagged": list(self.flagged),
+        }
+
+
+class _Histogram(object):
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, size):
+        # Non cumulative, the last one counting the values above the
+        # highest bucket.
+        self.counts = [0] * (size + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PhaseHistograms(object):
+    """`db_method` timing hook (see `database.set_timing_hook()`)
+    aggregating one latency histogram per method and phase.
+
+    Arguments:
+        buckets -- upper bounds of the histogram buckets, in seconds
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._histograms = {}
+
+    def __call__(self, method_name, body, flush, commit):
+        with self._lock:
+            for phase, duration in zip(DB_METHOD_PHASES, (body, flush, commit)):
+                if duration is None:
+                    continue
+
+                histogram = self._histograms.get((method_name, phase))
+                if histogram is None:
+                    histogram = _Histogram(len(self.buckets))
+                    self._histograms[(method_name, phase)] = histogram
+
+                histogram.counts[bisect.bisect_left(self.buckets, duration)] += 1
+                histogram.count += 1
+                histogram.sum += duration
+
+    def _snapshot(self):
+        with self._lock:
+            return sorted(
+                (key, list(histogram.counts), histogram.count, histogram.sum)
+                for key, histogram in self._histograms.items()
+            )
+
+    def as_dict(self):
+        """Return the histograms as
+        `{method_name: {phase: {"count", "sum", "buckets"}}}`, buckets
+        being a list of `(upper_bound, cumulative_count)` tuples ending
+        with `("+Inf", count)`.
+
+        """
+        result = {}
+        for (method_name, phase), counts, count, total in self._snapshot():
+            cumulative = 0
+            buckets = []
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                buckets.append((bound, cumulative))
+
+            result.setdefault(method_name, {})[phase] = {
+                "count": count,
+                "sum": total,
+                "buckets": buckets,
+            }
+
+        return result
+
+    def prometheus_text(self, name="yesaide_db_method_duration_seconds"):
+        """Return the histograms in the Prometheus text exposition
+        format, labelled by `method` and `phase`.
+
+        """
+        lines = [
+            "# HELP {} Duration of the db_method phases.".format(name),
+            "# TYPE {} histogram".format(name),
+        ]
+
+        for method_name, phases in self.as_dict().items():
+            for phase, histogram in phases.items():
+                labels = 'method="{}",phase="{}"'.format(_escape_label(method_name), phase)
+                for bound, cumulative in histogram["buckets"]:
+                    lines.append(
+                        '{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, cumulative)
+                    )
+                lines.append("{}_sum{{{}}} {!r}".format(name, labels, histogram["sum"]))
+                lines.append("{}_count{{{}}} {}".format(name, labels, histogram["count"]))
+
+        return "\n".join(lines) + "\n"
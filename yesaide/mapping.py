@@ -1,28 +1,32 @@
 import inspect
+import uuid
 
-from voluptuous import Schema
+from sqlalchemy import inspect as sqla_inspect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.sql.schema import ColumnDefault
+from voluptuous import Invalid, Schema
 
-from yesaide.database import MetaBase
+from yesaide import YesaideRuntimeError
+from yesaide.database import GUIDType, MetaBase
 
 
-def update(sqla_obj, schema, ignore_keys=None, **kwargs):
-    """Update an `instance`. Return False if there is no update and
-    True otherwise.
+# Maximum number of ids sent in a single `IN (...)` clause.
+DEFAULT_CHUNK_SIZE = 500
 
-    Do not raise error if too many arguments are given.
+# Policies for ids which can't be found by `order_by_ids()`.
+MISSING_RAISE = "raise"
+MISSING_SKIP = "skip"
+MISSING_NONE = "none"
 
-    Do not commit the database session.
 
-    Keyword arguments:
-        sqla_obj -- SQLAlchemy object to update
-        schema -- voluptuous schema to perform data validation
-        ignore_keys -- list of keys that will be ignored by this
-                       function
+def _validate_update(sqla_obj, schema, ignore_keys, kwargs):
+    """Validate the update of `sqla_obj` with `kwargs` against
+    `schema` and return a `(obj_update_dict, obj_current_dict,
+    to_update)` tuple.
 
     """
-    if not isinstance(schema, Schema):
-        raise AttributeError("`schema` must be a voluptuous schema.")
-
     if ignore_keys is None:
         ignore_keys = []
 
@@ -42,12 +46,316 @@ def update(sqla_obj, schema, ignore_keys=None, **kwargs):
 
     obj_update_dict = schema(obj_update_dict)
 
+    return obj_update_dict, obj_current_dict, to_update
+
+
+def update(sqla_obj, schema, ignore_keys=None, **kwargs):
+    """Update an `instance`. Return False if there is no update and
+    True otherwise.
+
+    Do not raise error if too many arguments are given.
+
+    Do not commit the database session.
+
+    Keyword arguments:
+        sqla_obj -- SQLAlchemy object to update
+        schema -- voluptuous schema to perform data validation
+        ignore_keys -- list of keys that will be ignored by this
+                       function
+
+    """
+    if not isinstance(schema, Schema):
+        raise AttributeError("`schema` must be a voluptuous schema.")
+
+    obj_update_dict, obj_current_dict, to_update = _validate_update(
+        sqla_obj, schema, ignore_keys, kwargs
+    )
+
     for item in to_update:
         setattr(sqla_obj, item, obj_update_dict[item])
 
     return obj_update_dict != obj_current_dict
 
 
+def update_many(objects_and_kwargs, schema, ignore_keys=None):
+    """Update several objects at once and return the list of the
+    objects which have been changed.
+
+    Every update is validated as in `update()`, then only the changed
+    columns are written, with one executemany `UPDATE` per mapping and
+    set of changed columns (see `Session.bulk_update_mappings()`)
+    instead of one `UPDATE` per object at flush time. Objects which are
+    not persistent in a session (and attributes which are not columns,
+    e.g. relationships) are updated with `setattr()`, as in `update()`.
+
+    Do not commit the database session.
+
+    Keyword arguments:
+        objects_and_kwargs -- iterable of `(sqla_obj, kwargs)` tuples
+        schema -- voluptuous schema to perform data validation
+        ignore_keys -- list of keys that will be ignored by this
+                       function
+
+    """
+    if not isinstance(schema, Schema):
+        raise AttributeError("`schema` must be a voluptuous schema.")
+
+    # Validate everything before touching any object.
+    changes = []
+    for sqla_obj, kwargs in objects_and_kwargs:
+        obj_update_dict, obj_current_dict, to_update = _validate_update(
+            sqla_obj, schema, ignore_keys, kwargs
+        )
+
+        if obj_update_dict == obj_current_dict:
+            continue
+
+        changed_values = {
+            k: obj_update_dict[k]
+            for k in to_update
+            if k not in obj_current_dict or obj_current_dict[k] != obj_update_dict[k]
+        }
+        changes.append((sqla_obj, changed_values))
+
+    # Bulk mappings, as `{(session, mapper): [(sqla_obj, values)]}`.
+    bulk_updates = {}
+    for sqla_obj, changed_values in changes:
+        state = sqla_inspect(sqla_obj, raiseerr=False)
+
+        if state is None or state.session is None or not state.persistent:
+            for k, v in changed_values.items():
+                setattr(sqla_obj, k, v)
+            continue
+
+        column_keys = state.mapper.column_attrs.keys()
+        column_values = {}
+        for k, v in changed_values.items():
+            if k in column_keys:
+                column_values[k] = v
+            else:
+                setattr(sqla_obj, k, v)
+
+        if column_values:
+            bulk_key = (state.session, state.mapper)
+            bulk_updates.setdefault(bulk_key, []).append((sqla_obj, column_values))
+
+    for (session, mapper), objs_and_values in bulk_updates.items():
+        pk_keys = [mapper.get_property_by_column(c).key for c in mapper.primary_key]
+
+        mappings = []
+        for sqla_obj, column_values in objs_and_values:
+            a_mapping = {k: getattr(sqla_obj, k) for k in pk_keys}
+            a_mapping.update(column_values)
+            mappings.append(a_mapping)
+
+        session.bulk_update_mappings(mapper, mappings)
+
+        # The database is up to date, reflect the new values on the
+        # objects without marking them as modified.
+        for sqla_obj, column_values in objs_and_values:
+            for k, v in column_values.items():
+                set_committed_value(sqla_obj, k, v)
+
+    return [sqla_obj for sqla_obj, _ in changes]
+
+
+class InsertManyResult(object):
+    """Result of `insert_many()`.
+
+    Attributes:
+        inserted -- number of inserted rows
+        ids -- if ids were requested, list of the primary key of every
+               given row (a tuple for composite primary keys), None for
+               the rows which failed
+        errors -- list of `(row_index, exception)` tuples, one for each
+                  row which failed validation or insertion
+
+    """
+
+    def __init__(self, inserted, ids, errors):
+        self.inserted = inserted
+        self.ids = ids
+        self.errors = errors
+
+
+# Code of the `lambda ctx: fn()` wrapper SQLAlchemy puts around the
+# callable defaults which don't take an execution context (callables
+# which take one are kept as is).
+_context_free_wrapper_code = ColumnDefault(lambda: None).arg.__code__
+
+
+def _python_default(column):
+    """Return a function generating the client side default value of
+    `column`, or None if it has none (or needs an execution context).
+
+    """
+    default = column.default
+    if default is None or default.is_sequence or default.is_clause_element:
+        return None
+    if default.is_scalar:
+        return lambda: default.arg
+    if getattr(default.arg, "__code__", None) is not _context_free_wrapper_code:
+        # Needs an execution context: left to the `INSERT` itself.
+        return None
+    return lambda: default.arg(None)
+
+
+def insert_many(
+    dbsession,
+    sqla_map,
+    rows,
+    schema,
+    batch_size=DEFAULT_CHUNK_SIZE,
+    returning=False,
+    isolate_errors=False,
+):
+    """Validate `rows` (list of dicts) with `schema` and insert them in
+    the table of `sqla_map`, with one executemany Core `INSERT` per
+    batch of `batch_size` rows instead of one ORM object (and one
+    flushed `INSERT`) per row (rows of a batch are grouped by set of
+    keys, as executemany requires the same keys for every row).
+
+    Each batch runs in its own SAVEPOINT. If `isolate_errors` is true,
+    a batch which fails is rolled back and its rows are inserted one by
+    one (each in its own SAVEPOINT), and the rows failing validation or
+    insertion are reported in `InsertManyResult.errors` instead of
+    raising. Otherwise the first error is raised (validation errors
+    have their path prefixed with the row index) and no row is
+    inserted by the failing batch.
+
+    If `returning` is true, the primary keys of the inserted rows are
+    returned in `InsertManyResult.ids`. Primary keys with a client side
+    default (e.g. `GUIDType` columns with `default=uuid7`) are generated
+    before the insert, so they don't need a round trip. Otherwise they
+    are read with `INSERT ... RETURNING` where the dialect supports it
+    with executemany, one `INSERT` per row elsewhere.
+
+    Objects are not added to the session and ORM events are not fired.
+    Do not commit the database session.
+
+    """
+    if not isinstance(schema, Schema):
+        raise AttributeError("`schema` must be a voluptuous schema.")
+
+    mapper = sqla_inspect(sqla_map)
+    table = mapper.local_table
+    columns = {prop.key: prop.columns[0] for prop in mapper.column_attrs}
+    pk_columns = list(mapper.primary_key)
+    pk_keys = [mapper.get_property_by_column(column).key for column in pk_columns]
+    pk_defaults = [_python_default(column) for column in pk_columns]
+    normalizers = [id_normalizer(column) for column in pk_columns]
+
+    errors = []
+    # Parameters of the rows to insert, as `(row_index, params)`.
+    to_insert = []
+    for index, row in enumerate(rows):
+        try:
+            values = schema(row)
+        except Invalid as exc:
+            if not isolate_errors:
+                exc.prepend([index])
+                raise
+            errors.append((index, exc))
+            continue
+
+        params = {}
+        for key, value in values.items():
+            if key not in columns:
+                raise YesaideRuntimeError("`{}` is not a column of {}.".format(key, sqla_map))
+            params[columns[key].key] = value
+
+        for column, key, default in zip(pk_columns, pk_keys, pk_defaults):
+            if params.get(column.key) is None and default is not None:
+                params[column.key] = default()
+
+        to_insert.append((index, params))
+
+    ids = [None] * len(rows) if returning else None
+    statement = table.insert()
+    known_pks = all(
+        params.get(column.key) is not None for _, params in to_insert for column in pk_columns
+    )
+    returning_pks = returning and not known_pks
+    executemany = True
+    if returning_pks:
+        if dbsession.get_bind(mapper).dialect.insert_executemany_returning:
+            statement = statement.returning(*pk_columns)
+        else:
+            # Rely on `inserted_primary_key` (e.g. `cursor.lastrowid`).
+            executemany = False
+
+    def execute(batch):
+        # Rows of an executemany must all have the same keys.
+        groups = {}
+        for index, params in batch:
+            groups.setdefault(tuple(sorted(params)), []).append((index, params))
+
+        pks = []
+        with dbsession.begin_nested():
+            for group in groups.values():
+                if executemany:
+                    result = dbsession.execute(statement, [params for _, params in group])
+                    if returning_pks:
+                        # `inserted_primary_key_rows` can't be used with
+                        # an explicit `returning()`.
+                        pks.extend(zip(group, result.all()))
+                else:
+                    for index_and_params in group:
+                        result = dbsession.execute(statement, index_and_params[1])
+                        pks.append((index_and_params, result.inserted_primary_key))
+
+        if returning:
+            if not returning_pks:
+                pks = [
+                    ((index, params), [params[column.key] for column in pk_columns])
+                    for index, params in batch
+                ]
+            for (index, _), pk_row in pks:
+                pk = [normalize(value) for normalize, value in zip(normalizers, pk_row)]
+                ids[index] = pk[0] if len(pk) == 1 else tuple(pk)
+
+    inserted = 0
+    for batch in iter_chunks(to_insert, batch_size):
+        try:
+            execute(batch)
+            inserted += len(batch)
+        except DBAPIError as exc:
+            if not isolate_errors:
+                raise
+            if len(batch) == 1:
+                errors.append((batch[0][0], exc))
+                continue
+
+            for index_and_params in batch:
+                try:
+                    execute([index_and_params])
+                    inserted += 1
+                except DBAPIError as row_exc:
+                    errors.append((index_and_params[0], row_exc))
+
+    errors.sort(key=lambda error: error[0])
+    return InsertManyResult(inserted, ids, errors)
+
+
+class ResolveIdError(NoResultFound):
+    """Exception raised when some of the ids given to `resolve_id()` or
+    `resolve_many()` can't be found.
+
+    `errors` holds a list of `(row_index, key, value)` tuples, one for
+    each id which can't be resolved.
+
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        NoResultFound.__init__(
+            self,
+            "No row was found for: {}.".format(
+                ", ".join("{!r} (row {})".format(v, i) for i, _, v in errors)
+            ),
+        )
+
+
 def resolve_id(build_query, a_dict, schema, allow_none_id=False):
     """Return a dict fulfilled with the missing objects according to
     the given dict (in `a_dict`) and `schema`.
@@ -71,43 +379,196 @@ def resolve_id(build_query, a_dict, schema, allow_none_id=False):
         allow_none_id -- bool (see above)
 
     """
-    _a_dict = a_dict.copy()
+    return resolve_many(build_query, [a_dict], schema, allow_none_id=allow_none_id)[0]
 
-    for key, sqla_map in schema.schema.items():
-        if key in _a_dict.keys():
-            continue
 
+def resolve_many(build_query, dicts, schema, allow_none_id=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Same as `resolve_id()`, for a list of dicts.
+
+    All the ids referencing the same mapping are fetched at once (one
+    query per mapping and per chunk of `chunk_size` ids), whatever the
+    number of dicts.
+
+    Raise a `ResolveIdError` listing every id which can't be found.
+
+    """
+    _dicts = [a_dict.copy() for a_dict in dicts]
+
+    # Ids to fetch, as `(row_index, key, sqla_map, id_key, value)`.
+    to_resolve = []
+
+    for key, sqla_map in schema.schema.items():
         if not inspect.isclass(sqla_map) or not issubclass(sqla_map, MetaBase):
             continue
 
         key_id = "{}_id".format(key)
         key_uuid = "{}_uuid".format(key)
 
-        if key_id in a_dict and key_uuid in a_dict:
-            raise Exception(
-                "`_resolve_id()` has been called with "
-                "both an `object_id` and an "
-                "`object_uuid`."
-            )
+        for index, (a_dict, _a_dict) in enumerate(zip(dicts, _dicts)):
+            if key in _a_dict.keys():
+                continue
 
-        elif key_id in a_dict:
-            val_id = _a_dict.pop(key_id)
-            if not val_id and allow_none_id:
-                val = None
+            if key_id in a_dict and key_uuid in a_dict:
+                raise Exception(
+                    "`_resolve_id()` has been called with "
+                    "both an `object_id` and an "
+                    "`object_uuid`."
+                )
 
-            else:
-                val = build_query(sqla_map).filter(sqla_map.id == val_id).one()
+            elif key_id in a_dict:
+                id_key = "id"
+                val_id = _a_dict.pop(key_id)
 
-            _a_dict[str(key)] = val
+            elif key_uuid in a_dict:
+                id_key = "uuid"
+                val_id = _a_dict.pop(key_uuid)
 
-        elif key_uuid in a_dict:
-            val_uuid = _a_dict.pop(key_uuid)
-            if not val_uuid and allow_none_id:
-                val = None
+            else:
+                continue
 
+            if not val_id and allow_none_id:
+                _a_dict[str(key)] = None
             else:
-                val = build_query(sqla_map).filter(sqla_map.uuid == val_uuid).one()
+                to_resolve.append((index, str(key), sqla_map, id_key, val_id))
+
+    # Group ids per mapping and id column to issue one query each.
+    grouped = {}
+    for index, key, sqla_map, id_key, val_id in to_resolve:
+        grouped.setdefault((sqla_map, id_key), []).append(val_id)
+
+    found = {}
+    for (sqla_map, id_key), ids in grouped.items():
+        id_column = getattr(sqla_map, id_key)
+        found[(sqla_map, id_key)] = (
+            fetch_by_ids(build_query(sqla_map), id_column, ids, chunk_size=chunk_size),
+            id_normalizer(id_column),
+        )
+
+    errors = []
+    for index, key, sqla_map, id_key, val_id in to_resolve:
+        objs, normalize = found[(sqla_map, id_key)]
+        val = objs.get(normalize(val_id))
+
+        if val is None:
+            errors.append((index, key, val_id))
+        else:
+            _dicts[index][key] = val
+
+    if errors:
+        errors.sort(key=lambda error: error[0])
+        raise ResolveIdError(errors)
+
+    return _dicts
+
+
+def _normalize_raw_uuid(value):
+    # Raw `GUIDType` values are read as 32 characters hex strings.
+    if isinstance(value, uuid.UUID):
+        return value.hex
+    try:
+        return uuid.UUID(value).hex
+    except (ValueError, TypeError, AttributeError):
+        return value
+
+
+def id_normalizer(id_column):
+    """Return a function casting a given id to the python type used by
+    `id_column`, so that ids given by the user (e.g. a stringified
+    uuid) and ids read from the database can be compared.
+
+    Values which can't be casted are returned untouched (they won't
+    match any object).
+
+    """
+    if isinstance(id_column.type, GUIDType):
+        if id_column.type.raw:
+            return _normalize_raw_uuid
+        python_type = uuid.UUID
+    else:
+        try:
+            python_type = id_column.type.python_type
+        except (AttributeError, NotImplementedError):
+            return lambda value: value
+
+    def normalize(value):
+        if isinstance(value, python_type):
+            return value
+        try:
+            return python_type(value)
+        except (ValueError, TypeError, AttributeError):
+            return value
+
+    return normalize
+
+
+def iter_chunks(values, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield successive lists of at most `chunk_size` items from
+    `values`.
+
+    """
+    values = list(values)
+    for i in range(0, len(values), chunk_size):
+        yield values[i : i + chunk_size]
+
+
+def fetch_by_ids(query, id_column, ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Fetch all the objects whose `id_column` is in `ids` and return
+    them in a dict, indexed by their (normalized) id.
+
+    One `IN (...)` query is issued per chunk of `chunk_size` distinct
+    ids, on top of the given `query`.
+
+    Arguments:
+        query -- base SQLAlchemy query (filters are kept)
+        id_column -- mapped column holding the ids (e.g. `Mapping.id`)
+        ids -- iterable of ids
+        chunk_size -- maximum number of ids per query
+
+    """
+    normalize = id_normalizer(id_column)
+    distinct_ids = []
+    seen = set()
+    for an_id in ids:
+        if an_id is None:
+            continue
+        an_id = normalize(an_id)
+        if an_id not in seen:
+            seen.add(an_id)
+            distinct_ids.append(an_id)
+
+    found = {}
+    for chunk in iter_chunks(distinct_ids, chunk_size):
+        for sqla_obj in query.filter(id_column.in_(chunk)):
+            found[getattr(sqla_obj, id_column.key)] = sqla_obj
+
+    return found
+
+
+def order_by_ids(ids, found, normalize=None, missing=MISSING_RAISE):
+    """Return the objects of `found` (as returned by `fetch_by_ids()`)
+    in the order of `ids`.
+
+    `missing` tells what to do with ids which are not in `found`:
+    raise `NoResultFound` (`MISSING_RAISE`), leave them out
+    (`MISSING_SKIP`) or put `None` in their place (`MISSING_NONE`).
+
+    """
+    if missing not in (MISSING_RAISE, MISSING_SKIP, MISSING_NONE):
+        raise ValueError("Wrong `missing` policy.")
+
+    if normalize is None:
+        normalize = lambda value: value
+
+    ordered = []
+    for an_id in ids:
+        sqla_obj = found.get(normalize(an_id)) if an_id is not None else None
+
+        if sqla_obj is None:
+            if missing == MISSING_RAISE:
+                raise NoResultFound("No row was found for id {!r}.".format(an_id))
+            elif missing == MISSING_SKIP:
+                continue
 
-            _a_dict[str(key)] = val
+        ordered.append(sqla_obj)
 
-    return _a_dict
+    return ordered
@@ -0,0 +1,244 @@
+"""Keyset (a.k.a. seek) pagination.
+
+Instead of skipping rows with `OFFSET`, each page is fetched with a
+`WHERE (sort keys) > (sort keys of the last row of the previous page)`
+clause, which an index on the sort keys resolves directly: the last
+page costs the same as the first one.
+
+The position of a page is given by an opaque cursor (see
+`encode_cursor()`), returned by the previous page.
+
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import uuid
+
+from sqlalchemy import and_, inspect as sqla_inspect, literal, or_, tuple_
+from sqlalchemy.sql import operators
+
+from yesaide import YesaideRuntimeError
+
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor can't be decoded, or doesn't match the
+    sort keys of the pagination.
+
+    """
+
+
+class Page(object):
+    """Page of results returned by `paginate()`.
+
+    Attributes:
+        items -- list of objects of the page
+        next_cursor -- cursor of the next page, or None if this is the
+                       last one
+
+    """
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class _SortKey(object):
+    __slots__ = ("name", "column", "descending")
+
+    def __init__(self, name, column, descending):
+        self.name = name
+        self.column = column
+        self.descending = descending
+
+
+def sort_keys(sqla_map, order_by, unique_column=None):
+    """Return the sort keys described by `order_by`, a sequence of:
+
+      - mapped attributes, e.g. `User.created_at`, or their `.desc()`
+        / `.asc()` versions;
+      - attribute names, prefixed with "-" for a descending order.
+
+    `unique_column` (e.g. the id column) is appended if it isn't part
+    of `order_by` already, so that rows are always strictly ordered. It
+    follows the direction of the last key, so that the keys can be
+    compared as a single row value.
+
+    """
+    mapper = sqla_inspect(sqla_map)
+
+    keys = []
+    for item in order_by:
+        descending = False
+
+        if isinstance(item, str):
+            if item.startswith("-"):
+                descending = True
+                item = item[1:]
+            name = item
+
+        else:
+            modifier = getattr(item, "modifier", None)
+            if modifier in (operators.desc_op, operators.asc_op):
+                descending = modifier is operators.desc_op
+                item = item.element
+
+            if hasattr(item, "property"):
+                name = item.key
+            else:
+                # Column of a `.desc()` / `.asc()` expression.
+                name = mapper.get_property_by_column(item).key
+
+        keys.append(_SortKey(name, getattr(sqla_map, name), descending))
+
+    if unique_column is not None and unique_column.key not in [key.name for key in keys]:
+        descending = keys[-1].descending if keys else False
+        keys.append(_SortKey(unique_column.key, unique_column, descending))
+
+    if not keys:
+        raise YesaideRuntimeError("No sort keys to paginate on.")
+
+    return keys
+
+
+_encoders = (
+    (bool, "b", lambda value: value),
+    (int, "i", lambda value: value),
+    (float, "f", lambda value: value),
+    (str, "s", lambda value: value),
+    (uuid.UUID, "u", lambda value: value.hex),
+    (datetime.datetime, "dt", lambda value: value.isoformat()),
+    (datetime.date, "d", lambda value: value.isoformat()),
+    (decimal.Decimal, "n", str),
+)
+
+_decoders = {
+    "b": bool,
+    "i": int,
+    "f": float,
+    "s": str,
+    "u": uuid.UUID,
+    "dt": datetime.datetime.fromisoformat,
+    "d": datetime.date.fromisoformat,
+    "n": decimal.Decimal,
+}
+
+
+def _encode_value(value):
+    for value_type, tag, encode in _encoders:
+        if isinstance(value, value_type):
+            return [tag, encode(value)]
+
+    if value is None:
+        raise YesaideRuntimeError("Can't paginate on NULL values.")
+
+    raise YesaideRuntimeError("Can't build a cursor from {!r}.".format(value))
+
+
+def encode_cursor(keys, values):
+    """Return the opaque cursor of the row whose sort keys values are
+    `values`.
+
+    Cursors are URL safe base64 JSON documents holding the sort keys
+    names and their (type tagged) values.
+
+    """
+    document = {"k": [key.name for key in keys], "v": [_encode_value(v) for v in values]}
+    raw = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(keys, cursor):
+    """Return the sort keys values stored in `cursor`.
+
+    Raise `InvalidCursorError` if the cursor is malformed or if it was
+    built for other sort keys.
+
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        document = json.loads(raw.decode("utf-8"))
+        names, tagged_values = document["k"], document["v"]
+        values = [_decoders[tag](value) for tag, value in tagged_values]
+    except (
+        TypeError,
+        ValueError,
+        KeyError,
+        AttributeError,
+        binascii.Error,
+        decimal.InvalidOperation,
+    ):
+        raise InvalidCursorError("Malformed cursor.")
+
+    if names != [key.name for key in keys] or len(values) != len(keys):
+        raise InvalidCursorError("Cursor doesn't match the sort keys.")
+
+    return values
+
+
+def _after_clause(keys, values):
+    """Return the clause selecting the rows located after `values`."""
+    values = [literal(value, key.column.type) for key, value in zip(keys, values)]
+
+    if len(set(key.descending for key in keys)) == 1:
+        if len(keys) == 1:
+            left, right = keys[0].column, values[0]
+        else:
+            left, right = tuple_(*[key.column for key in keys]), tuple_(*values)
+
+        if keys[0].descending:
+            return left < right
+        return left > right
+
+    # Mixed directions: (a > x) OR (a = x AND b < y) OR ...
+    clauses = []
+    for i, key in enumerate(keys):
+        equalities = [keys[j].column == values[j] for j in range(i)]
+        if key.descending:
+            comparison = key.column < values[i]
+        else:
+            comparison = key.column > values[i]
+        clauses.append(and_(*equalities, comparison))
+
+    return or_(*clauses)
+
+
+def paginate(query, sqla_map, order_by, after=None, limit=DEFAULT_PAGE_SIZE, unique_column=None):
+    """Return the `Page` of at most `limit` objects of `query` following
+    the `after` cursor (the first page if None).
+
+    See `sort_keys()` for `order_by` and `unique_column`. Any ordering
+    of `query` is replaced by the sort keys.
+
+    """
+    if limit < 1:
+        raise ValueError("`limit` must be positive.")
+
+    keys = sort_keys(sqla_map, order_by, unique_column)
+
+    if after is not None:
+        query = query.filter(_after_clause(keys, decode_cursor(keys, after)))
+
+    ordering = [key.column.desc() if key.descending else key.column.asc() for key in keys]
+    items = query.order_by(None).order_by(*ordering).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(keys, [getattr(items[-1], key.name) for key in keys])
+
+    return Page(items, next_cursor)
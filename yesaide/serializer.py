@@ -0,0 +1,147 @@
+"""Declarative serializers, compiled once into plain python functions.
+
+A serializer is described by a list of fields, e.g.:
+
+    fields = (
+        "id",
+        Field("uuid", convert=uuid_to_str),
+        Field("created_on", name="creation_date", convert=date_to_str),
+        Field("country.code", name="country"),
+    )
+
+and `compile_serializer(fields)` returns a function equivalent to:
+
+    def serialize(item):
+        return {
+            "id": item.id,
+            "uuid": uuid_to_str(item.uuid) if item.uuid is not None else None,
+            ...
+        }
+
+"""
+import functools
+
+from sqlalchemy import inspect as sqla_inspect
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty
+
+
+def uuid_to_str(value):
+    return str(value)
+
+
+def date_to_str(value):
+    """Works for dates and datetimes."""
+    return value.isoformat()
+
+
+def decimal_to_str(value):
+    return str(value)
+
+
+class Field(object):
+    """A field of a declarative serializer.
+
+    Arguments:
+        attr -- attribute path on the serialized object, dotted paths
+                (e.g. "country.code") follow relationships
+        name -- key in the serialized dict (defaults to `attr`)
+        convert -- function applied to the value, unless it's None
+
+    """
+
+    def __init__(self, attr, name=None, convert=None):
+        path = attr.split(".")
+        if not all(segment.isidentifier() for segment in path):
+            raise ValueError("Invalid attribute path: {!r}.".format(attr))
+
+        self.attr = attr
+        self.path = path
+        self.name = name if name is not None else attr
+        self.convert = convert
+
+
+def _as_field(field):
+    if isinstance(field, Field):
+        return field
+    return Field(field)
+
+
+def compile_serializer(fields):
+    """Compile the given fields (`Field` instances or attribute paths)
+    into a function taking an object and returning its serialized
+    version (a dict).
+
+    Compiled functions are cached, declaring fields once (e.g. as a
+    class attribute) means compiling them once.
+
+    """
+    return _compile_serializer(tuple(fields))
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_serializer(fields):
+    fields = [_as_field(field) for field in fields]
+
+    namespace = {}
+    lines = ["def serialize(item, **kwargs):"]
+    items = []
+
+    for i, field in enumerate(fields):
+        var = "v{}".format(i)
+        lines.append("    {} = item.{}".format(var, field.path[0]))
+        for segment in field.path[1:]:
+            lines.append("    if {} is not None:".format(var))
+            lines.append("        {0} = {0}.{1}".format(var, segment))
+
+        if field.convert is None:
+            items.append("{!r}: {}".format(field.name, var))
+        else:
+            namespace["c{}".format(i)] = field.convert
+            items.append("{0!r}: None if {1} is None else c{2}({1})".format(field.name, var, i))
+
+    lines.append("    return {{{}}}".format(", ".join(items)))
+
+    exec(compile("\n".join(lines), "<yesaide serializer>", "exec"), namespace)
+    return namespace["serialize"]
+
+
+def load_only_keys(sqla_map, fields):
+    """Return the keys of the column attributes of `sqla_map` needed
+    to serialize the given fields, to be used with `load_only()`.
+
+    Primary keys are always included, as well as the foreign keys of
+    the relationships used by the fields. Return None if some fields
+    are neither columns nor relationships (e.g. python properties),
+    as the columns they need can't be known.
+
+    """
+    return _load_only_keys(sqla_map, tuple(fields))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_only_keys(sqla_map, fields):
+    mapper = sqla_inspect(sqla_map)
+
+    keys = [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+
+    def add_column(column):
+        key = mapper.get_property_by_column(column).key
+        if key not in keys:
+            keys.append(key)
+
+    for field in fields:
+        prop = mapper.attrs.get(_as_field(field).path[0])
+
+        if isinstance(prop, ColumnProperty):
+            for column in prop.columns:
+                add_column(column)
+
+        elif isinstance(prop, RelationshipProperty):
+            for column in prop.local_columns:
+                if column.table in mapper.tables:
+                    add_column(column)
+
+        else:
+            return None
+
+    return tuple(keys)
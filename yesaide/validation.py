@@ -4,11 +4,26 @@ voluptuous.
 """
 import datetime
 import decimal
+import inspect
 import math
 import re
 import uuid
 
-from voluptuous import Invalid, Required, Schema
+from voluptuous import (
+    ALLOW_EXTRA,
+    REMOVE_EXTRA,
+    Invalid,
+    MultipleInvalid,
+    Optional,
+    Required,
+    RequiredFieldInvalid,
+    Schema,
+)
+from voluptuous.schema_builder import Undefined
+
+
+# Random (4) and time-ordered (7, see `database.uuid7()`) UUIDs.
+_uuid_versions = (4, 7)
 
 
 def is_valid_uuid(value):
@@ -16,10 +31,13 @@ def is_valid_uuid(value):
         return True
 
     try:
-        maybe_value = uuid.UUID(value, version=4)
+        maybe_value = uuid.UUID(value)
     except ValueError:
         return False
 
+    if maybe_value.version not in _uuid_versions:
+        return False
+
     return maybe_value.hex == value.replace("-", "").replace(" ", "")
 
 
@@ -110,9 +128,27 @@ def Decimable(empty_to_none=False, cast=True, nan_allowed=False, msg=None):
     return f
 
 
+def _iso_date(value):
+    """Return the date of `value` if it's a "YYYY-MM-DD" string, None
+    otherwise.
+
+    Much faster than `strptime()` (no locale nor regular expression),
+    but stricter (e.g. for non padded months), hence only a shortcut.
+
+    """
+    if type(value) is not str or len(value) != 10 or value[4] != "-" or value[7] != "-":
+        return None
+
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
 def Dateable(empty_to_none=False, cast=True, format=None, msg=None):
     if format is None:
         format = "%Y-%m-%d"
+    iso = format == "%Y-%m-%d"
 
     def f(value):
         if value in [None, ""] and empty_to_none:
@@ -121,6 +157,11 @@ def Dateable(empty_to_none=False, cast=True, format=None, msg=None):
         if isinstance(value, datetime.date):
             return value
 
+        if iso:
+            casted_value = _iso_date(value)
+            if casted_value is not None:
+                return casted_value if cast else value
+
         try:
             casted_value = datetime.datetime.strptime(value, format)
         except ValueError:
@@ -133,6 +174,40 @@ def Dateable(empty_to_none=False, cast=True, format=None, msg=None):
     return f
 
 
+def Datetimeable(empty_to_none=False, cast=True, msg=None):
+    """Validate ISO 8601 timestamps with an UTC offset (or "Z"), e.g.
+    "2015-11-13T21:30:00+01:00", cast to timezone aware datetimes (as
+    expected by `Period.from_reference_datetime()`). Naive timestamps
+    and datetimes are refused, aware datetimes are returned as is.
+
+    """
+
+    def f(value):
+        if value in [None, ""] and empty_to_none:
+            return None
+
+        if isinstance(value, datetime.datetime):
+            casted_value = value
+        else:
+            try:
+                if value[-1:] in ("Z", "z"):
+                    # Only understood by `fromisoformat()` since 3.11.
+                    casted_value = datetime.datetime.fromisoformat(value[:-1] + "+00:00")
+                else:
+                    casted_value = datetime.datetime.fromisoformat(value)
+            except (ValueError, TypeError):
+                raise Invalid(msg or "Given value cannot be casted to a datetime.")
+
+        if casted_value.tzinfo is None or casted_value.utcoffset() is None:
+            raise Invalid(msg or "Given datetime has no timezone.")
+
+        if cast:
+            return casted_value
+        return value
+
+    return f
+
+
 def Choice(in_list, msg=None):
     def f(value):
         if value not in in_list:
@@ -186,6 +261,24 @@ def adapt_dict(input_dict, keep=None, remove=None, make_required=None):
     return output_dict
 
 
+def _required_keys(schema):
+    """Return the set of the keys required by the dict `schema`, as
+    found by voluptuous itself validating an empty dict (compiling an
+    `All()` or `Any()` value resets `schema.required`, so it can't be
+    trusted once the schema is built).
+
+    """
+    try:
+        Schema.__call__(schema, {})
+    except MultipleInvalid as exc:
+        return {
+            getattr(error.path[0], "schema", error.path[0])
+            for error in exc.errors
+            if isinstance(error, RequiredFieldInvalid) and len(error.path) == 1
+        }
+    return set()
+
+
 class SchemaDictNone(Schema):
     """Custom implementation of a dict schema where all values except
     thoses specified in `not_none` (and thoses required) could be None.
@@ -211,19 +304,292 @@ class SchemaDictNone(Schema):
         if not isinstance(schema, dict):
             raise ValueError("This special Schema is intented to be used with " "dict only.")
         Schema.__init__(self, schema, required, extra)
-        self._not_none = not_none if not_none is not False else ()
+        self._not_none = frozenset(not_none) if not_none is not False else frozenset()
+        self._validators, self._required_keys = self._compile_fast_path(schema)
+
+    def _compile_fast_path(self, schema):
+        """Return the `(validators, required_keys)` used by the fast
+        path of `__call__()`: the compiled validator of each key and the
+        set of required keys, or `(None, None)` if the schema uses
+        features the fast path doesn't handle (non string keys, markers
+        other than `Required` / `Optional`, default values).
+
+        """
+        validators = {}
+
+        for skey, svalue in schema.items():
+            if type(skey) is str:
+                key = skey
+            elif type(skey) in (Required, Optional) and type(skey.schema) is str:
+                if not isinstance(skey.default, Undefined):
+                    return None, None
+                key = skey.schema
+            else:
+                return None, None
+
+            validators[key] = self._compile(svalue)
+
+        return validators, frozenset(_required_keys(self))
 
     def __call__(self, data):
-        _data = data.copy()
-        popped = []
+        if self._validators is None or type(data) is not dict:
+            return self._call_voluptuous(data)
 
-        for k, v in data.items():
-            if v is None and k not in self._not_none:
-                _data.pop(k)
-                popped.append((k, v))
+        validators = self._validators
+        not_none = self._not_none
+        extra = self.extra
+
+        out = {}
+        popped = []
+        try:
+            for k, v in data.items():
+                if v is None and k not in not_none:
+                    popped.append(k)
+                    continue
+
+                validator = validators.get(k)
+                if validator is not None:
+                    out[k] = validator([k], v)
+                elif extra == ALLOW_EXTRA:
+                    out[k] = v
+                elif extra != REMOVE_EXTRA:
+                    raise Invalid("extra keys not allowed")
+        except Invalid:
+            # Let voluptuous build the exact same errors.
+            return self._call_voluptuous(data)
+
+        if not self._required_keys.issubset(out):
+            return self._call_voluptuous(data)
+
+        for k in popped:
+            out[k] = None
+
+        return out
+
+    def _call_voluptuous(self, data):
+        """Validate `data` with voluptuous, without its None values
+        (which are put back afterwards).
+
+        """
+        popped = [k for k, v in data.items() if v is None and k not in self._not_none]
+        if popped:
+            _data = data.copy()
+            for k in popped:
+                del _data[k]
+        else:
+            # Voluptuous doesn't modify the validated data.
+            _data = data
 
         schema_out = Schema.__call__(self, _data)
-        for k, v in popped:
-            schema_out[k] = v
+        for k in popped:
+            schema_out[k] = None
 
         return schema_out
+
+
+# Value of the keys missing from the validated data, in the functions
+# generated by `compile_schema()`.
+_missing = object()
+
+
+class _Uncompilable(Exception):
+    pass
+
+
+def compile_schema(schema):
+    """Return a function validating data like the given voluptuous
+    dict schema (`Schema` or `SchemaDictNone`, or a dict which is
+    wrapped in a `Schema`), generated for this schema: each key is
+    looked up and validated by straight line code instead of walking
+    the schema for each call.
+
+    Generated functions handle string keys (optionally wrapped in
+    `Required` / `Optional`, with or without default values), the
+    `required` and `extra` options of the schema, and the None values
+    of `SchemaDictNone`. Values validated by plain functions (e.g.
+    `Integeable()`, `Mail()`) and types are checked inline, any other
+    value schema goes through its voluptuous compiled validator.
+
+    When the data is invalid (or isn't a plain dict), it is validated
+    again by voluptuous, so that the very same `MultipleInvalid` is
+    raised. Schemas which can't be compiled (other markers, non string
+    keys, ...) are returned as is.
+
+    Unlike voluptuous, the keys of the returned dict follow the order
+    of the schema rather than the one of the data.
+
+    """
+    if isinstance(schema, dict):
+        schema = Schema(schema)
+
+    if not isinstance(schema.schema, dict):
+        return schema
+
+    try:
+        return _compile_schema(schema)
+    except _Uncompilable:
+        return schema
+
+
+def _compile_schema(schema):
+    nullable = isinstance(schema, SchemaDictNone)
+    not_none = schema._not_none if nullable else frozenset()
+
+    namespace = {"_missing": _missing, "_fallback": schema, "_Invalid": Invalid}
+    lines = [
+        "def validate(data):",
+        "    if data.__class__ is not dict:",
+        "        return _fallback(data)",
+        "    out = {}",
+        "    found = 0",
+        "    try:",
+    ]
+
+    keys = set()
+    required_keys = _required_keys(schema)
+    for i, (skey, svalue) in enumerate(schema.schema.items()):
+        default = None
+        if type(skey) is str:
+            key = skey
+        elif type(skey) in (Required, Optional) and type(skey.schema) is str:
+            key = skey.schema
+            if not isinstance(skey.default, Undefined):
+                default = skey.default
+        else:
+            raise _Uncompilable()
+
+        # Keys with a default value are never missing for voluptuous.
+        is_required = key in required_keys or type(skey) is Required
+        keys.add(key)
+        lines.append("        v = data.get({!r}, _missing)".format(key))
+        lines.append("        if v is _missing:")
+        if default is not None:
+            namespace["d{}".format(i)] = default
+            lines.append("            v = d{}()".format(i))
+        elif is_required:
+            lines.append("            return _fallback(data)")
+        else:
+            lines.append("            pass")
+        lines.append("        else:")
+        lines.append("            found += 1")
+
+        if nullable and key not in not_none:
+            # Set aside by `SchemaDictNone`: a missing required key.
+            lines.append("        if v is None:")
+            if is_required:
+                lines.append("            return _fallback(data)")
+            else:
+                lines.append("            out[{!r}] = None".format(key))
+            lines.append("        elif v is not _missing:")
+        else:
+            lines.append("        if v is not _missing:")
+
+        if inspect.isclass(svalue):
+            namespace["t{}".format(i)] = svalue
+            lines.append("            if not isinstance(v, t{}):".format(i))
+            lines.append("                return _fallback(data)")
+            lines.append("            out[{!r}] = v".format(key))
+        elif callable(svalue) and not hasattr(svalue, "__voluptuous_compile__"):
+            namespace["f{}".format(i)] = svalue
+            lines.append("            out[{!r}] = f{}(v)".format(key, i))
+        else:
+            namespace["c{}".format(i)] = schema._compile(svalue)
+            lines.append("            out[{0!r}] = c{1}([{0!r}], v)".format(key, i))
+
+    lines += [
+        "    except (_Invalid, ValueError):",
+        "        return _fallback(data)",
+        "    if found != len(data):",
+        "        return _extra(data, out)",
+        "    return out",
+    ]
+    namespace["_extra"] = _extra_keys_handler(schema, keys, not_none if nullable else None)
+
+    exec(compile("\n".join(lines), "<yesaide schema>", "exec"), namespace)
+    validate = namespace["validate"]
+    validate.schema = schema
+    return validate
+
+
+def _extra_keys_handler(schema, keys, not_none):
+    """Return the function handling the keys of the data which are not
+    in the schema, for the functions generated by `compile_schema()`.
+
+    `not_none` is None for schemas which are not `SchemaDictNone`.
+
+    """
+    extra = schema.extra
+
+    def handle_extra_keys(data, out):
+        for k, v in data.items():
+            if k in keys:
+                continue
+            if not_none is not None and v is None and k not in not_none:
+                out[k] = None
+            elif extra == ALLOW_EXTRA:
+                out[k] = v
+            elif extra != REMOVE_EXTRA:
+                return schema(data)
+        return out
+
+    return handle_extra_keys
+
+
+class ValidateManyResult(object):
+    """Result of `validate_many()`.
+
+    Attributes:
+        valid -- list of the validated valid rows, in order
+        errors -- list of `(row_index, MultipleInvalid)` tuples, one for
+                  each invalid row (an unexpected exception raised by a
+                  validator is turned into an `Invalid` at the row
+                  level, with the exception as its `__cause__`)
+
+    """
+
+    def __init__(self, valid, errors):
+        self.valid = valid
+        self.errors = errors
+
+
+def validate_many(schema, rows):
+    """Validate each of `rows` with `schema` (a `Schema`, a
+    `SchemaDictNone` or a dict), and return a `ValidateManyResult`
+    instead of raising on the first invalid row.
+
+    Rows are validated by the `compile_schema()` version of the schema,
+    compiled once and kept on the schema. Exceptions other than
+    `Invalid` raised by validators (e.g. the `TypeError` of `Mail()`
+    given an integer) are reported as errors of their row too.
+
+    """
+    if isinstance(schema, dict):
+        schema = Schema(schema)
+
+    validate = _compiled(schema)
+    valid = []
+    errors = []
+    for i, row in enumerate(rows):
+        try:
+            valid.append(validate(row))
+        except MultipleInvalid as exc:
+            errors.append((i, exc))
+        except Invalid as exc:
+            errors.append((i, MultipleInvalid([exc])))
+        except Exception as exc:
+            error = Invalid("{}: {}".format(type(exc).__name__, exc))
+            error.__cause__ = exc
+            errors.append((i, MultipleInvalid([error])))
+
+    return ValidateManyResult(valid, errors)
+
+
+def _compiled(schema):
+    """Return `compile_schema(schema)`, cached on the schema (which,
+    like voluptuous, must not be modified afterwards).
+
+    """
+    validate = schema.__dict__.get("_ya_compiled")
+    if validate is None:
+        validate = schema._ya_compiled = compile_schema(schema)
+    return validate
@@ -1,12 +1,54 @@
-from yesaide import YesaideRuntimeError
+import contextlib
+import uuid
+
+from sqlalchemy import inspect as sqla_inspect
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.util import identity_key
+
+from yesaide import YesaideRuntimeError, cache, database, mapping, pagination, serializer
 
 
 class RawWorker(object):
     """Deepest worker, root of all the interactions, only ensure that
-    a sqlalchemy database session is available in `self._dbsession`."""
+    a sqlalchemy database session is available in `self._dbsession`.
+
+    An optional read replica session (or a session factory, called on
+    first use) can be given as `read_dbsession`, see
+    `read_dbsession()`.
+
+    """
 
-    def __init__(self, dbsession):
+    def __init__(self, dbsession, read_dbsession=None):
         self._dbsession = dbsession
+        self._read_dbsession = read_dbsession
+
+    def read_dbsession(self):
+        """Return the read replica session, or None if there is none."""
+        read_dbsession = getattr(self, "_read_dbsession", None)
+        if callable(read_dbsession):
+            read_dbsession = self._read_dbsession = read_dbsession()
+        return read_dbsession
+
+    def opened_read_dbsession(self):
+        """Same as `read_dbsession()`, but None if the session factory
+        hasn't been called yet.
+
+        """
+        read_dbsession = getattr(self, "_read_dbsession", None)
+        return None if callable(read_dbsession) else read_dbsession
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Open a transaction scope on the worker database session, see
+        `yesaide.database.transaction()`.
+
+        Objects of the read replica session can't be modified inside it
+        (see `yesaide.database.check_read_dbsession()`).
+
+        """
+        with database.transaction(self._dbsession) as scope:
+            yield scope
+            database.check_read_dbsession(self)
 
 
 class SupervisedWorker(RawWorker):
@@ -14,12 +56,29 @@ class SupervisedWorker(RawWorker):
 
     def __init__(self, foreman, foreman_name=None):
         RawWorker.__init__(self, foreman._dbsession)
+        self._ya_supervisor = foreman
 
         if not foreman_name:
             foreman_name = "_foreman"
 
         setattr(self, foreman_name, foreman)
 
+    def read_dbsession(self):
+        """Return the read replica session of the foreman, shared by
+        all its workers, or None if the foreman has none.
+
+        """
+        read_dbsession = getattr(self._ya_supervisor, "read_dbsession", None)
+        return None if read_dbsession is None else read_dbsession()
+
+    def opened_read_dbsession(self):
+        """Same as `RawWorker.opened_read_dbsession()`, for the read
+        replica session of the foreman.
+
+        """
+        opened_read_dbsession = getattr(self._ya_supervisor, "opened_read_dbsession", None)
+        return None if opened_read_dbsession is None else opened_read_dbsession()
+
 
 class MappingManagingWorker(SupervisedWorker):
     """Worker intended to be used inside a foreman, to take care of a
@@ -27,6 +86,54 @@ class MappingManagingWorker(SupervisedWorker):
 
     """
 
+    # Maximum number of ids sent in a single query by `get_many()`.
+    get_many_chunk_size = mapping.DEFAULT_CHUNK_SIZE
+
+    # Look for the requested objects in the session identity map
+    # before issuing a query (see `identity_map_predicate()`).
+    use_identity_map = False
+
+    # Number of rows fetched at once by `serialize_iter()`.
+    serialize_iter_chunk_size = 1000
+
+    # Declarative serialization: list of fields (see
+    # `yesaide.serializer`) used by the default `serialize()`.
+    serializer_fields = None
+
+    # Only load the columns needed by `serializer_fields` in `_get()`,
+    # `get_many()` and `serialize_iter()`.
+    serializer_load_only = False
+
+    # Read-through cache backend used by `_get()` without options nor
+    # load profile (see `yesaide.cache`), invalidated each time a
+    # `db_method` of the worker commits, and only filled by reads of the
+    # primary session.
+    cache_backend = None
+
+    # Send the reads of `get()`, `get_many()` and `serialize_iter()` to
+    # the read replica session of the foreman, if any (see
+    # `_reading_dbsession()`).
+    use_read_replica = True
+
+    # Named sets of loader options (e.g. `selectinload()` of the
+    # relationships used by `serialize()`), selected with the `profile`
+    # argument of `get()`, `get_many()`, `serialize_iter()` and
+    # `paginate()`, e.g.:
+    #
+    #     load_profiles = {
+    #         "list": [selectinload(User.country)],
+    #         "detail": [selectinload(User.country), selectinload(User.addresses)],
+    #     }
+    load_profiles = {}
+
+    # Number of rows inserted by each `INSERT` of `create_many()`.
+    create_many_batch_size = 1000
+
+    # Default sort keys of `paginate()` (see
+    # `yesaide.pagination.sort_keys()`), the id column is always used
+    # as the last one.
+    paginate_order_by = ()
+
     def __init__(
         self,
         foreman=None,
@@ -45,7 +152,20 @@ class MappingManagingWorker(SupervisedWorker):
         self._with_id = id_type == "id" or hasattr(self._sqla_map, "id")
         self._with_uuid = id_type == "uuid" or hasattr(self._sqla_map, "uuid")
 
-    def _get(self, sqla_obj_id=None, sqla_obj=None, options=None, **kwargs):
+        self.identity_map_hits = 0
+        self.identity_map_misses = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _get(
+        self,
+        sqla_obj_id=None,
+        sqla_obj=None,
+        options=None,
+        use_primary=False,
+        profile=None,
+        **kwargs
+    ):
         """Unified internal get for a SQLAlchemy object present in
         `sqla_obj_id` or `sqla_obj`, whose type is `self._sqla_map`.
 
@@ -55,6 +175,10 @@ class MappingManagingWorker(SupervisedWorker):
             sqla_obj -- SQLAlchemy object (internal use)
             options -- list of SQLAchemy options to apply to the SQL
                        request
+            use_primary -- never read from the read replica (see
+                           `_reading_dbsession()`)
+            profile -- name of the load profile (see `load_profiles`)
+                       to apply to the SQL request
 
         """
         if sqla_obj:
@@ -63,28 +187,197 @@ class MappingManagingWorker(SupervisedWorker):
             return sqla_obj
 
         elif sqla_obj_id:
-            query = self.base_query(**kwargs)
-
-            if self._with_id:
-                query = query.filter(self._sqla_map.id == sqla_obj_id)
-            elif self._with_uuid:
-                query = query.filter(self._sqla_map.uuid == sqla_obj_id)
-            else:
-                raise YesaideRuntimeError("Can't determine id field.")
+            # Objects of the identity map or of the cache may lack the
+            # relationships of the profile.
+            if self.use_identity_map and not options and profile is None:
+                sqla_obj = self._get_from_identity_map(sqla_obj_id, **kwargs)
+                if sqla_obj is not None:
+                    return sqla_obj
+
+            cache_key = None
+            if (
+                self.cache_backend is not None
+                and not options
+                and profile is None
+                and self._can_use_cache()
+            ):
+                cache_key = self._cache_key(sqla_obj_id, **kwargs)
+
+            dbsession = self._reading_dbsession(use_primary)
+            if cache_key is not None:
+                values = self.cache_backend.get(cache_key)
+                if values is not None:
+                    self.cache_hits += 1
+                    return cache.load_state(dbsession, self._sqla_map, values)
+                self.cache_misses += 1
+
+                # A lagging read replica could put back rows which a
+                # commit has just invalidated.
+                if dbsession is not self._dbsession:
+                    cache_key = None
+
+            id_column = self._id_column()
+            query = self.base_query(**kwargs).filter(id_column == sqla_obj_id)
+            query = self._read_query(query, use_primary)
 
             if options is None:
                 options = []
 
-            return query.options(*options).one()
+            sqla_obj = query.options(
+                *self._default_options(), *self._profile_options(profile), *options
+            ).one()
+
+            if cache_key is not None:
+                values = cache.dump_state(sqla_obj)
+                if values is not None:
+                    self.cache_backend.set(cache_key, values)
+
+            return sqla_obj
 
         raise TypeError("No criteria provided.")
 
-    def get(self, sqla_obj_id=None, sqla_obj=None, options=None, **kwargs):
+    def _id_column(self):
+        """Return the mapped column used to identify objects (`id` or
+        `uuid`).
+
+        """
+        if self._with_id:
+            return self._sqla_map.id
+        elif self._with_uuid:
+            return self._sqla_map.uuid
+        raise YesaideRuntimeError("Can't determine id field.")
+
+    def _can_use_cache(self):
+        """Tell if the cache can be read and filled, i.e. unless the
+        session may hold uncommitted changes (a `db_method` or a
+        `transaction()` is running, or objects are pending): cached
+        objects could miss them, or be filled with changes which a
+        rollback would discard.
+
+        """
+        dbsession = self._dbsession
+        if database.is_writing(dbsession):
+            return False
+        return not (dbsession.new or dbsession.dirty or dbsession.deleted)
+
+    def _cache_namespace(self):
+        return "{}.{}".format(self._sqla_map.__module__, self._sqla_map.__qualname__)
+
+    def _cache_key(self, sqla_obj_id, **kwargs):
+        """Return the key under which the object identified by
+        `sqla_obj_id` is cached, or None if it can't be cached (e.g. `kwargs` are not
+        hashable).
+
+        Keys embed a generation token, renewed by `invalidate_cache()`
+        (or when the token itself has been evicted from the cache).
+
+        """
+        try:
+            extra = tuple(sorted(kwargs.items()))
+            hash(extra)
+        except TypeError:
+            return None
+
+        namespace = self._cache_namespace()
+        generation = self.cache_backend.get(("generation", namespace))
+        if generation is None:
+            generation = self._renew_cache_generation()
+
+        sqla_obj_id = mapping.id_normalizer(self._id_column())(sqla_obj_id)
+
+        return (namespace, generation, sqla_obj_id, extra)
+
+    def invalidate_cache(self):
+        """Invalidate all the cached objects of this worker mapping.
+
+        Called each time a `db_method` of this worker commits, and when
+        a `transaction()` of this worker is rolled back.
+
+        """
+        if self.cache_backend is not None:
+            self._renew_cache_generation()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Same as `RawWorker.transaction()`, also invalidating the
+        cache of this worker if the transaction is rolled back.
+
+        """
+        with RawWorker.transaction(self) as scope:
+            if self.cache_backend is not None:
+                scope.on_rollback(self.invalidate_cache)
+            yield scope
+
+    def _renew_cache_generation(self):
+        generation = uuid.uuid4().hex
+        self.cache_backend.set(("generation", self._cache_namespace()), generation)
+        return generation
+
+    def _get_from_identity_map(self, sqla_obj_id, **kwargs):
+        """Return the object identified by `sqla_obj_id` if it is
+        already present in the session identity map and satisfies
+        `self.identity_map_predicate()`, None otherwise.
+
+        Expired objects (e.g. every object after a commit) are misses,
+        as their row may have been changed or deleted since.
+
+        """
+        id_column = self._id_column()
+        key = identity_key(self._sqla_map, mapping.id_normalizer(id_column)(sqla_obj_id))
+        sqla_obj = self._dbsession.identity_map.get(key)
+
+        if sqla_obj is not None:
+            state = sqla_inspect(sqla_obj)
+            if state.expired or state.expired_attributes:
+                sqla_obj = None
+
+        if (
+            sqla_obj is None
+            or sqla_obj in self._dbsession.deleted
+            or not self.identity_map_predicate(sqla_obj, **kwargs)
+        ):
+            self.identity_map_misses += 1
+            return None
+
+        self.identity_map_hits += 1
+        return sqla_obj
+
+    def identity_map_predicate(self, sqla_obj, **kwargs):
+        """Tell if an object found in the session identity map would
+        have been returned by `self.base_query(**kwargs)`.
+
+        Subclasses filtering objects in `base_query()` and using
+        `use_identity_map` must override this method to apply the same
+        rules, e.g.:
+
+            return sqla_obj.is_active
+
+        """
+        return True
+
+    def get(
+        self,
+        sqla_obj_id=None,
+        sqla_obj=None,
+        options=None,
+        use_primary=False,
+        profile=None,
+        **kwargs
+    ):
         """Unified external get for an object present in `sqla_obj_id`
         or `sqla_obj`.
 
         See also `ObjectManagingWorker._get()`.
 
+        """
+        sqla_obj_id, sqla_obj = self._get_criteria(sqla_obj_id, sqla_obj, kwargs)
+        return self._get(sqla_obj_id, sqla_obj, options, use_primary, profile, **kwargs)
+
+    def _get_criteria(self, sqla_obj_id, sqla_obj, kwargs):
+        """Return the `(sqla_obj_id, sqla_obj)` criteria of `get()`,
+        looking for `<name>`, `<name>_id` or `<name>_uuid` in `kwargs`
+        if none is given.
+
         """
         if not sqla_obj_id and not sqla_obj:
             if not self._sqla_map_name:
@@ -107,7 +400,149 @@ class MappingManagingWorker(SupervisedWorker):
             else:
                 raise TypeError("No criteria provided.")
 
-        return self._get(sqla_obj_id, sqla_obj, options, **kwargs)
+        return sqla_obj_id, sqla_obj
+
+    def get_many(
+        self,
+        sqla_obj_ids,
+        options=None,
+        missing=mapping.MISSING_RAISE,
+        use_primary=False,
+        profile=None,
+        **kwargs
+    ):
+        """Get all the objects whose id (or uuid) is in `sqla_obj_ids`,
+        in the same order.
+
+        Objects are fetched on top of `self.base_query()` with one
+        `IN (...)` query per chunk of `self.get_many_chunk_size` ids.
+
+        Keyword arguments:
+            sqla_obj_ids -- list of ids (or uuids) of the requested
+                            objects
+            options -- list of SQLAchemy options to apply to the SQL
+                       request
+            missing -- what to do with unknown ids: raise
+                       `NoResultFound` ("raise"), leave them out
+                       ("skip") or put `None` in their place ("none")
+            use_primary -- never read from the read replica (see
+                           `_reading_dbsession()`)
+            profile -- name of the load profile (see `load_profiles`)
+                       to apply to the SQL request
+
+        """
+        if missing not in (mapping.MISSING_RAISE, mapping.MISSING_SKIP, mapping.MISSING_NONE):
+            raise ValueError("Wrong `missing` policy.")
+
+        sqla_obj_ids = list(sqla_obj_ids)
+        if not sqla_obj_ids:
+            return []
+
+        id_column = self._id_column()
+        normalize = mapping.id_normalizer(id_column)
+
+        found = {}
+        to_fetch = sqla_obj_ids
+        # Objects of the identity map may lack the relationships of the
+        # profile, which would then be lazy loaded one object at a time.
+        if self.use_identity_map and not options and profile is None:
+            to_fetch = []
+            for sqla_obj_id in sqla_obj_ids:
+                if sqla_obj_id is None or normalize(sqla_obj_id) in found:
+                    continue
+                sqla_obj = self._get_from_identity_map(sqla_obj_id, **kwargs)
+                if sqla_obj is None:
+                    to_fetch.append(sqla_obj_id)
+                else:
+                    found[normalize(sqla_obj_id)] = sqla_obj
+
+        if to_fetch:
+            query = self.base_query(**kwargs).options(
+                *self._default_options(), *self._profile_options(profile)
+            )
+            query = self._read_query(query, use_primary)
+
+            if options:
+                query = query.options(*options)
+
+            found.update(
+                mapping.fetch_by_ids(
+                    query, id_column, to_fetch, chunk_size=self.get_many_chunk_size
+                )
+            )
+
+        return mapping.order_by_ids(sqla_obj_ids, found, normalize=normalize, missing=missing)
+
+    def paginate(
+        self,
+        after=None,
+        limit=pagination.DEFAULT_PAGE_SIZE,
+        order_by=None,
+        options=None,
+        use_primary=False,
+        profile=None,
+        **kwargs
+    ):
+        """Return a `yesaide.pagination.Page` of at most `limit` objects
+        of `self.base_query(**kwargs)`, located after the `after` cursor
+        (the first page if None).
+
+        Pages are fetched with keyset pagination instead of `OFFSET`,
+        so deep pages cost the same as the first one as long as the sort
+        keys are indexed.
+
+        Keyword arguments:
+            after -- `next_cursor` of the previous page
+            limit -- maximum number of objects of the page
+            order_by -- sort keys, defaults to `self.paginate_order_by`
+                        (the cursors of a pagination only work with
+                        the sort keys they were built with)
+            options -- list of SQLAchemy options to apply to the SQL
+                       request
+            use_primary -- never read from the read replica (see
+                           `_reading_dbsession()`)
+            profile -- name of the load profile (see `load_profiles`)
+                       to apply to the SQL request
+
+        """
+        if order_by is None:
+            order_by = self.paginate_order_by
+
+        query = self.base_query(**kwargs).options(
+            *self._default_options(), *self._profile_options(profile)
+        )
+        query = self._read_query(query, use_primary)
+
+        if options:
+            query = query.options(*options)
+
+        return pagination.paginate(
+            query, self._sqla_map, order_by, after, limit, unique_column=self._id_column()
+        )
+
+    @database.db_method
+    def create_many(self, rows, schema, batch_size=None, returning=False, isolate_errors=False):
+        """Validate `rows` (list of dicts) with `schema` and insert them
+        with executemany Core `INSERT`s of `batch_size` rows (defaults
+        to `self.create_many_batch_size`).
+
+        Return a `yesaide.mapping.InsertManyResult`, see
+        `yesaide.mapping.insert_many()` for `returning` and
+        `isolate_errors`.
+
+        """
+        if batch_size is None:
+            batch_size = self.create_many_batch_size
+
+        return mapping.insert_many(
+            self._dbsession,
+            self._sqla_map,
+            rows,
+            schema,
+            batch_size=batch_size,
+            returning=returning,
+            isolate_errors=isolate_errors,
+        )
 
     def base_query(self, **kwargs):
         """Base sqlalchemy query for this kind of object
@@ -117,6 +552,67 @@ class MappingManagingWorker(SupervisedWorker):
         """
         return self._dbsession.query(self._sqla_map)
 
+    def _reading_dbsession(self, use_primary=False):
+        """Return the session pure reads must use: the read replica
+        session, unless:
+
+          - there is no read replica session, or `use_read_replica` is
+            false;
+          - `use_primary` is true (e.g. to read your own writes, or to
+            get objects which are going to be modified: objects loaded
+            from the read replica belong to its session, and
+            `db_method`s refuse to commit changes made to them, see
+            `yesaide.database.check_read_dbsession()`);
+          - a `db_method` or a `transaction()` scope is in progress on
+            the primary session (see `database.is_writing()`).
+
+        """
+        if use_primary or not self.use_read_replica or database.is_writing(self._dbsession):
+            return self._dbsession
+
+        read_dbsession = self.read_dbsession()
+        if read_dbsession is None:
+            return self._dbsession
+
+        return read_dbsession
+
+    def _read_query(self, query, use_primary=False):
+        """Return `query` bound to the session returned by
+        `_reading_dbsession()`.
+
+        """
+        dbsession = self._reading_dbsession(use_primary)
+        if dbsession is query.session:
+            return query
+        return query.with_session(dbsession)
+
+    def _default_options(self):
+        """Return the SQLAlchemy options applied to every query built
+        by `_get()`, `get_many()` and `serialize_iter()`.
+
+        """
+        if not self.serializer_load_only or not self.serializer_fields:
+            return []
+
+        keys = serializer.load_only_keys(self._sqla_map, self.serializer_fields)
+        if keys is None:
+            return []
+
+        return [load_only(*[getattr(self._sqla_map, key) for key in keys])]
+
+    def _profile_options(self, profile):
+        """Return the SQLAlchemy options of the `profile` load profile
+        (see `load_profiles`), none if `profile` is None.
+
+        """
+        if profile is None:
+            return ()
+
+        try:
+            return self.load_profiles[profile]
+        except KeyError:
+            raise ValueError("Unknown load profile: {!r}.".format(profile))
+
     def serialize(self, items, **kwargs):
         """Transform the given item into an easily serializable item.
 
@@ -127,5 +623,67 @@ class MappingManagingWorker(SupervisedWorker):
 
             return {'id': item.id}
 
+        Subclasses can also declare `serializer_fields` instead, which
+        are compiled once into an equivalent function, e.g.:
+
+            serializer_fields = ('id', Field('uuid', convert=uuid_to_str))
+
+        """
+        if self.serializer_fields is None:
+            raise NotImplementedError("Subclasses must implement `serialize()`.")
+
+        return serializer.compile_serializer(self.serializer_fields)(items, **kwargs)
+
+    def serialize_iter(
+        self, query=None, chunk_size=None, use_primary=False, profile=None, **kwargs
+    ):
+        """Yield the serialized version (see `serialize()`) of every
+        object returned by `query`, which defaults to
+        `self.base_query(**kwargs)` (sent to the read replica session
+        unless `use_primary` is true, see `_reading_dbsession()`) with
+        the options of the `profile` load profile (see `load_profiles`).
+
+        Collections of the profile must be loaded with `selectinload()`
+        rather than `joinedload()`, which can't be used while rows are
+        streamed.
+
+        Rows are streamed (server side cursor where the driver supports
+        it) and fetched `chunk_size` by `chunk_size`. Once a chunk has
+        been serialized, its objects are expunged from the session so
+        that memory usage doesn't grow with the number of rows. Objects
+        which were already in the session or which have been modified
+        are left alone.
+
         """
-        raise NotImplementedError("Subclasses must implement `serialize()`.")
+        if query is None:
+            query = self.base_query(**kwargs).options(
+                *self._default_options(), *self._profile_options(profile)
+            )
+            query = self._read_query(query, use_primary)
+
+        if chunk_size is None:
+            chunk_size = self.serialize_iter_chunk_size
+
+        dbsession = query.session
+        already_there = set(dbsession.identity_map.keys())
+        query = query.execution_options(stream_results=True).yield_per(chunk_size)
+
+        chunk = []
+        for sqla_obj in query:
+            chunk.append(sqla_obj)
+
+            if len(chunk) >= chunk_size:
+                yield from self._serialize_chunk(dbsession, chunk, already_there)
+                chunk = []
+
+        yield from self._serialize_chunk(dbsession, chunk, already_there)
+
+    def _serialize_chunk(self, dbsession, chunk, already_there):
+        serialized = [self.serialize(sqla_obj) for sqla_obj in chunk]
+
+        for sqla_obj in chunk:
+            state = sqla_inspect(sqla_obj)
+            if state.session is dbsession and state.key not in already_there and not state.modified:
+                dbsession.expunge(sqla_obj)
+
+        return serialized